@@ -0,0 +1,138 @@
+""" Shared helpers for the benchmark scripts. """
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+LOCI = ['AMEL', 'CSF1PO', 'D10S1248', 'D12S391', 'D13S317', 'D16S539', 'D18S51', 'D19S433',
+        'D1S1656', 'D21S11', 'D22S1045', 'D2S1338', 'D2S441', 'D3S1358', 'D5S818', 'D7S820',
+        'D8S1179', 'FGA', 'PentaD', 'PentaE', 'SE33', 'TH01', 'TPOX', 'vWA']
+
+
+def load_dna_script(path=None):
+    """ Import 'DNA script.py' (not importable by name because of the space). """
+    path = path or os.path.join(REPO_DIR, 'DNA script.py')
+    spec = importlib.util.spec_from_file_location('dna_script', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['dna_script'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_long_table(n_specimens, related_rate=0.01, seed=0):
+    """ Long-format allele table like sequencing_summary.csv with planted related pairs. """
+    rng = np.random.default_rng(seed)
+    alleles = np.sort(rng.integers(6, 30, size=(n_specimens, len(LOCI), 2)), axis=2).astype(object)
+    alleles[:, 0] = [['X', 'Y']] * n_specimens
+    # Related specimens copy another profile and redraw two loci
+    related = rng.random(n_specimens) < related_rate
+    for i in np.flatnonzero(related)[1:]:
+        source = rng.integers(0, i)
+        alleles[i] = alleles[source]
+        for locus in rng.choice(np.arange(1, len(LOCI)), size=2, replace=False):
+            alleles[i, locus] = sorted(rng.integers(6, 30, size=2))
+    rows = []
+    for i in range(n_specimens):
+        specimen = f'S{i:07d}'
+        case = f'C{i // 10:06d}'
+        when = f'2024-01-{1 + i % 28:02d}T10:00:00'
+        for locus_index, locus in enumerate(LOCI):
+            first, second = alleles[i, locus_index]
+            values = [str(first)] if first == second else [str(first), str(second)]
+            for value in values:
+                rows.append((f'plate{i // 96}.xml', case, specimen, 'N/A', locus, 'ABI3500', when, value))
+    return pd.DataFrame(rows, columns=['FileName', 'CaseID', 'SpecimenID', 'SpecimenComment',
+                                       'LocusName', 'ReadingBy', 'ReadingDateTime', 'AlleleValue'])
+
+
+def write_codis_xml(path, n_specimens, seed=0):
+    """ Write a CODIS import file with n_specimens full profiles. """
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n<CODISImportFile xmlns="urn:CODISImportFile-schema">\n')
+        for i in range(n_specimens):
+            file.write(f'<SPECIMEN CASEID="C{i // 10:06d}"><SPECIMENID>S{i:07d}</SPECIMENID>'
+                       f'<SPECIMENCOMMENT>batch</SPECIMENCOMMENT>\n')
+            for locus in LOCI:
+                values = ['X', 'Y'] if locus == 'AMEL' else sorted(rng.integers(6, 30, size=2).tolist())
+                alleles = ''.join(f'<ALLELE><ALLELEVALUE>{value}</ALLELEVALUE></ALLELE>' for value in values)
+                file.write(f'<LOCUS><LOCUSNAME>{locus}</LOCUSNAME><READINGBY>ABI3500</READINGBY>'
+                           f'<READINGDATETIME>2024-01-01T10:00:00</READINGDATETIME>{alleles}</LOCUS>\n')
+            file.write('</SPECIMEN>\n')
+        file.write('</CODISImportFile>\n')
+
+
+def write_niem_xml(path, n_loci, seed=0):
+    """ Write a NIEM DNA transaction for one specimen with n_loci locus entries. """
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   '<DNADataTransaction xmlns:biom="http://release.niem.gov/niem/domains/biometrics/5.1/" '
+                   'xmlns:nc="http://release.niem.gov/niem/niem-core/5.0/">\n'
+                   '<nc:DocumentIdentification><nc:IdentificationID>CASE001</nc:IdentificationID></nc:DocumentIdentification>\n'
+                   '<biom:DNASample><biom:DNASourceIdentification><nc:IdentificationID>RH0001</nc:IdentificationID>'
+                   '</biom:DNASourceIdentification>\n<biom:DNADevice><biom:DeviceName>RapidHIT</biom:DeviceName></biom:DNADevice>\n'
+                   '<biom:DNAProfile>\n')
+        for k in range(n_loci):
+            values = rng.integers(6, 30, size=2).tolist()
+            alleles = ''.join(f'<biom:DNAAllele><biom:DNAAlleleCall1Text>{value}</biom:DNAAlleleCall1Text></biom:DNAAllele>'
+                              for value in values)
+            file.write(f'<biom:DNALocus><biom:DNALocusName>{LOCI[k % len(LOCI)]}</biom:DNALocusName>'
+                       f'<biom:ProcessUTCDate>2024-01-01T10:00:00Z</biom:ProcessUTCDate>{alleles}</biom:DNALocus>\n')
+        file.write('</biom:DNAProfile></biom:DNASample>\n</DNADataTransaction>\n')
+
+
+def write_genemapper_csv(path, n_specimens, seed=0):
+    """ Write a GeneMapper CSV export with one row per (sample, marker).
+
+    Homozygous calls leave Allele 2 blank (a single space, as the row-by-row parser expects).
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Sample File,Sample Name,Marker,Allele 1,Allele 2\n')
+        for i in range(n_specimens):
+            for locus in LOCI:
+                first, second = ('X', 'Y') if locus == 'AMEL' else sorted(rng.integers(6, 30, size=2).tolist())
+                second = ' ' if first == second else second
+                file.write(f'S{i:07d}.fsa,C{i // 10:06d} run1,{locus},{first},{second}\n')
+
+
+def write_abi_txt(path, n_specimens, seed=0):
+    """ Write an ABI 3500 TXT export: header lines, then one row per (sample, marker).
+
+    The first marker of each sample is on a row starting with the sample number and name.
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Project: D:\\Projects\\C000001\\plate.txt\nSoftware Package: GeneMapper ID-X\n'
+                   'Date/Time: 2024-01-02 10:00:00\n\n\tSample Name\tMarker\tAllele 1\tAllele 2\n')
+        for i in range(n_specimens):
+            for k, locus in enumerate(LOCI):
+                alleles = ['X', 'Y'] if locus == 'AMEL' else sorted({str(a) for a in rng.integers(6, 30, size=2).tolist()})
+                prefix = f'{i + 1}\tS{i:07d}\t' if k == 0 else '\t'
+                file.write(prefix + locus + '\t' + '\t'.join(alleles) + '\n')
+
+def peak_memory(func, *args, **kwargs):
+    """ Run func once under tracemalloc and return (result, peak traced MiB). """
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def timed(func, *args, **kwargs):
+    """ Run func once and return (result, seconds). """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
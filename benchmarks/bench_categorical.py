@@ -0,0 +1,42 @@
+""" Compare the long allele table with object string columns and with dictionary-encoded columns.
+
+Usage: python benchmarks/bench_categorical.py [specimens ...]
+
+For each size the table is measured as plain object columns and as compacted by
+dna_engine.categorical (memory with deep=True), then groupby, drop_duplicates and the summary
+pivot are timed on both and their results compared.
+"""
+import sys
+
+import pandas as pd
+
+from _common import load_dna_script, synthetic_long_table, timed
+from dna_engine.categorical import compact_rows
+
+KEYS = ['SpecimenID', 'LocusName']
+
+
+def main(sizes):
+    dna = load_dna_script()
+    print(f"{'specimens':>10} {'rows':>9} {'object MiB':>11} {'compact MiB':>12} "
+          f"{'groupby s':>17} {'drop_dup s':>17} {'pivot s':>17}")
+    for n in sizes:
+        plain = synthetic_long_table(n).astype(object)
+        compact = compact_rows(plain)
+        sizes_mib = [frame.memory_usage(deep=True).sum() / 2 ** 20 for frame in (plain, compact)]
+
+        cells = []
+        for name, func in (('groupby', lambda df: df.groupby(KEYS)['AlleleValue'].count().reset_index()),
+                           ('drop_duplicates', lambda df: df.drop_duplicates()),
+                           ('pivot', lambda df: dna.unmelting_data(df.copy()))):
+            plain_result, plain_time = timed(func, plain)
+            compact_result, compact_time = timed(func, compact)
+            pd.testing.assert_frame_equal(plain_result.reset_index(drop=True).astype(object),
+                                          compact_result.reset_index(drop=True).astype(object))
+            cells.append(f"{plain_time:>7.3f} / {compact_time:>7.3f}")
+        print(f"{n:>10} {len(plain):>9} {sizes_mib[0]:>11.1f} {sizes_mib[1]:>12.1f} " + ' '.join(f"{cell:>17}" for cell in cells))
+    print("Times are object / compact columns.")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,54 @@
+""" Compare the vectorized GeneMapper CSV parser with the row-by-row (iterrows) version.
+
+Usage: python benchmarks/bench_csv_parsing.py [specimens ...]
+"""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from _common import load_dna_script, timed, write_genemapper_csv
+
+from dna_engine.pipeline import get_folder_file_name
+
+
+def process_csv_file_rows(file_path):
+    """ The original row-by-row GeneMapper parser that process_csv_file replaced. """
+    df=pd.read_csv(file_path)
+    file_name = get_folder_file_name(file_path)  # Extract filename from file path
+    df.columns = df.columns.str.strip()
+    expanded_rows = []
+    for _, row in df.iterrows():
+        for allele_num in range(1, 3):  # Assuming there are only two alleles max as shown
+            allele_value = row[f'Allele {allele_num}'].strip()
+            if allele_value:  # Ensure non-empty alleles are processed
+                expanded_rows.append({
+                    'CaseID': row['Sample Name'].split()[0],  # Derived from Sample Name
+                    'SpecimenID': row['Sample File'],  # Using Sample File as SpecimenID
+                    'SpecimenComment': file_name,  # Example comment
+                    'LocusName': row['Marker'],
+                    'ReadingBy': 'ABI3500',  # Static example
+                    'ReadingDateTime': '0000-00-00T00:00:00',
+                    'AlleleValue': allele_value,
+                    'FileName': row['Sample File']  # Assuming FileName is needed
+                })
+    return pd.DataFrame(expanded_rows)
+
+
+def main(sizes):
+    dna = load_dna_script()
+    print(f"{'specimens':>10} {'rows':>9} {'iterrows s':>11} {'vectorized s':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for n in sizes:
+            path = os.path.join(folder, f'genemapper_{n}.csv')
+            write_genemapper_csv(path, n)
+            rows, rows_time = timed(process_csv_file_rows, path)
+            vectorized, vectorized_time = timed(dna.process_csv_file, path)
+            pd.testing.assert_frame_equal(rows, vectorized)
+            print(f"{n:>10} {len(vectorized):>9} {rows_time:>11.2f} {vectorized_time:>13.3f} "
+                  f"{rows_time / max(vectorized_time, 1e-9):>8.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000])
@@ -0,0 +1,83 @@
+""" Compare input file discovery with os.walk and with the concurrent FolderWalk.
+
+Usage: python benchmarks/bench_discovery.py [runs [latency_ms]]
+
+Builds an instrument archive of `runs` run folders (plate/run/sample subfolders, each sample with
+one result file and several .fsa/.hid files), then times finding and stat'ing the result files
+with os.walk (as the scan did before) and with FolderWalk on 1 and 8 threads, the time to the
+first file, and a second FolderWalk that skips the unchanged folders. latency_ms adds a delay to
+every folder listing, to stand in for a slow network share.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from _common import timed
+from dna_engine.discovery import FolderWalk
+
+FILE_TYPES = {'.xml': 'XML', '.txt': 'TXT', '.csv': 'CSV'}
+SAMPLES_PER_RUN = 8
+OTHER_FILES = ['.fsa', '.hid', '.fsa.bak', '.log']
+
+
+def build_archive(folder, runs):
+    for run in range(runs):
+        run_folder = os.path.join(folder, f'plate_{run // 10:03d}', f'run_{run:05d}')
+        for sample in range(SAMPLES_PER_RUN):
+            sample_folder = os.path.join(run_folder, f'sample_{sample:02d}')
+            os.makedirs(sample_folder)
+            for extension in OTHER_FILES:
+                open(os.path.join(sample_folder, f'S{sample:02d}{extension}'), 'w').close()
+        open(os.path.join(run_folder, 'export.txt'), 'w').close()
+
+
+def walk_files(folder):
+    """ The scan's file discovery before FolderWalk: os.walk, then os.stat per candidate. """
+    files = []
+    for root, dirs, names in os.walk(folder):
+        for name in names:
+            file_type = FILE_TYPES.get(os.path.splitext(name)[1])
+            if file_type:
+                path = os.path.join(root, name)
+                files.append((path, name, file_type, os.stat(path)))
+    return files
+
+
+def first_and_total(files):
+    start = time.perf_counter()
+    first, count = None, 0
+    for _ in files:
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return first, time.perf_counter() - start, count
+
+
+def main(runs, latency_ms):
+    scandir = os.scandir
+    if latency_ms:
+        def slow_scandir(path='.'):
+            time.sleep(latency_ms / 1000)
+            return scandir(path)
+        os.scandir = slow_scandir   # os.walk lists folders through os.scandir too
+    with tempfile.TemporaryDirectory() as folder:
+        build_archive(folder, runs)
+        time.sleep(2.1)   # let the folders age past RACY_NS, so they can be skipped
+        print(f"{runs} runs, {runs * (SAMPLES_PER_RUN + 1) + runs // 10 + 1} folders, "
+              f"{runs} result files, latency {latency_ms:g} ms per listing")
+        print(f"{'method':>22} {'first file s':>13} {'total s':>9} {'files':>7}")
+        found, total = timed(walk_files, folder)   # nothing is found before the walk ends
+        print(f"{'os.walk + os.stat':>22} {total:>13.3f} {total:>9.3f} {len(found):>7}")
+        for threads in (1, 8):
+            walk = FolderWalk(folder, FILE_TYPES, threads=threads)
+            first, total, count = first_and_total(walk)
+            print(f"{f'FolderWalk {threads} threads':>22} {first:>13.3f} {total:>9.3f} {count:>7}")
+        pruned = FolderWalk(folder, FILE_TYPES, known_folders=walk.folders)
+        _, total, count = first_and_total(pruned)
+        print(f"{'unchanged, pruned':>22} {'':>13} {total:>9.3f} {count:>7}  ({pruned.pruned} folders skipped)")
+    os.scandir = scandir
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, float(sys.argv[2]) if len(sys.argv) > 2 else 0)
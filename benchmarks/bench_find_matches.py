@@ -0,0 +1,35 @@
+""" Compare the matching engines with the original pairwise loop.
+
+Usage: python benchmarks/bench_find_matches.py [specimens ...]
+
+The loop is skipped above LOOP_LIMIT specimens; every engine that runs must return the same
+matches.
+"""
+import sys
+
+import pandas as pd
+
+from _common import load_dna_script, synthetic_long_table, timed
+from dna_engine.index import GenotypeIndex
+
+LOOP_LIMIT = 2000
+
+
+def main(sizes):
+    dna = load_dna_script()
+    print(f"{'specimens':>10} {'loop s':>10} {'numpy s':>10} {'build s':>10} {'index s':>10} {'matches':>8}")
+    for n in sizes:
+        df = synthetic_long_table(n, related_rate=0.05)
+        fast, fast_time = timed(dna.find_matches, df, 0.8, set(), engine='numpy')
+        index, build_time = timed(GenotypeIndex.build, df)
+        indexed, index_time = timed(dna.find_matches, df, 0.8, set(), engine='index', index=index)
+        pd.testing.assert_frame_equal(fast, indexed, check_dtype=False)
+        loop_time = float('nan')
+        if n <= LOOP_LIMIT:
+            loop, loop_time = timed(dna.find_matches, df, 0.8, set(), engine='loop')
+            pd.testing.assert_frame_equal(loop, fast, check_dtype=False)
+        print(f"{n:>10} {loop_time:>10.3f} {fast_time:>10.3f} {build_time:>10.3f} {index_time:>10.3f} {len(fast):>8}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [250, 500, 1000, 2000, 10000])
@@ -0,0 +1,42 @@
+""" Scaling of the tiled multi-process matching engine with the number of workers.
+
+Usage: python benchmarks/bench_parallel_matching.py [specimens [max_workers]]
+
+Scores all pairs of synthetic profiles with 1, 2, 4, ... workers up to max_workers (default: the
+CPU count), checks every run returns the same matches as the single-process NumPy engine, and
+prints time, pairs per second, and the speedup and parallel efficiency over one worker.
+"""
+import os
+import sys
+
+import pandas as pd
+
+from _common import synthetic_long_table, timed
+
+from dna_engine.genotypes import encode_profiles
+from dna_engine.matching import find_exact_matches
+from dna_engine.parallel import find_matches_parallel
+
+SENSITIVITY = 0.8
+
+
+def main(n_specimens, max_workers):
+    profiles = encode_profiles(synthetic_long_table(n_specimens))
+    pairs = n_specimens * (n_specimens - 1) // 2
+    expected, serial_time = timed(find_exact_matches, profiles, SENSITIVITY)
+    print(f"{n_specimens} specimens, {pairs} pairs, {len(expected)} matches, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'seconds':>9} {'Mpairs/s':>9} {'speedup':>8} {'efficiency':>11}")
+    print(f"{'serial':>8} {serial_time:>9.2f} {pairs / serial_time / 1e6:>9.1f}")
+    workers, one_worker = 1, None
+    while workers <= max_workers:
+        matches, seconds = timed(find_matches_parallel, profiles, SENSITIVITY, workers)
+        pd.testing.assert_frame_equal(expected, matches, check_dtype=False)
+        one_worker = one_worker or seconds
+        speedup = one_worker / seconds
+        print(f"{workers:>8} {seconds:>9.2f} {pairs / seconds / 1e6:>9.1f} {speedup:>7.2f}x {speedup / workers:>10.0%}")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 20000, args[1] if len(args) > 1 else os.cpu_count())
@@ -0,0 +1,170 @@
+""" Time each pipeline stage of one or more versions of DNA script.py on synthetic datasets.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--specimens 1000 10000] [--script OLD.py --script NEW.py]
+                                        [--stages parse,match,pivot,main] [--report report.json]
+    python benchmarks/bench_pipeline.py --compare old_report.json new_report.json
+
+Datasets are generated with synthetic.py into --data-dir and reused between runs. Every script
+version runs in its own Python process with the script's folder first on the path, so an older
+checkout uses its own dna_engine package. Each stage is timed, then run again under tracemalloc
+for its peak memory (--no-memory skips that). The report is JSON: one entry per script, dataset
+and stage with seconds, peak MiB and output rows.
+
+Stages: parse (scan_and_process_files), match (find_matches with no existing matches), pivot
+(unmelting_data) and main (a full run into an empty output folder, with the parse cache off).
+The original pairwise find_matches is quadratic, so leave out 'match' for old versions at large
+scales.
+"""
+import argparse
+import contextlib
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import REPO_DIR, load_dna_script, peak_memory, timed
+
+STAGES = ['parse', 'match', 'pivot', 'main']
+DEFAULT_SCRIPT = os.path.join(REPO_DIR, 'DNA script.py')
+
+
+def scan(dna, folder):
+    """ scan_and_process_files for both the manifest and the old file-name-list signature. """
+    if 'manifest' in inspect.signature(dna.scan_and_process_files).parameters:
+        from dna_engine.manifest import ScanManifest
+        return dna.scan_and_process_files(folder, ScanManifest())[0]
+    return dna.scan_and_process_files(folder, [])[0]
+
+
+def run_main(dna, folder, sensitivity):
+    """ A full run into an empty output folder, with the parse cache off where the version has one,
+    so every run parses the files and the user's cache is left alone. """
+    options = {'cache_mib': 0} if 'cache_mib' in inspect.signature(dna.main).parameters else {}
+    with tempfile.TemporaryDirectory() as output:
+        dna.main(folder, output, sensitivity, **options)
+        return sum(1 for _ in open(os.path.join(output, 'sequencing_summary.csv'), encoding='utf-8')) - 1
+
+
+def run_stages(script, dataset, stages, sensitivity, memory):
+    """ Run the stages of one script on one dataset (in this process) and return their results. """
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    dna = load_dna_script(script)
+    folder = os.path.join(dataset, 'input')
+    df = None
+    stage_funcs = {
+        'parse': lambda: scan(dna, folder),
+        'match': lambda: dna.find_matches(df.copy(), sensitivity, set()),
+        'pivot': lambda: dna.unmelting_data(df.copy()),
+        'main': lambda: run_main(dna, folder, sensitivity),
+    }
+    results = {}
+    for stage in stages:
+        if stage in ('match', 'pivot') and df is None:
+            with contextlib.redirect_stdout(sys.stderr):
+                df = scan(dna, folder)
+        with contextlib.redirect_stdout(sys.stderr):   # keep the script's progress messages off the report
+            output, seconds = timed(stage_funcs[stage])
+            peak = peak_memory(stage_funcs[stage])[1] if memory else None
+        if stage == 'parse':
+            df = output
+        results[stage] = {'seconds': round(seconds, 4), 'peak_mib': None if peak is None else round(peak, 1),
+                          'rows': output if isinstance(output, int) else len(output)}
+    return results
+
+
+def run_child(script, dataset, stages, sensitivity, memory):
+    """ run_stages in a fresh interpreter, so versions and their memory use don't mix. """
+    command = [sys.executable, os.path.abspath(__file__), '--child', script, dataset, '--stages', ','.join(stages),
+               '--sensitivity', str(sensitivity)] + ([] if memory else ['--no-memory'])
+    completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if completed.returncode:
+        raise RuntimeError(f"{script} failed:\n" + '\n'.join(completed.stderr.splitlines()[-15:]))
+    return json.loads(completed.stdout)
+
+
+def environment():
+    import numpy
+    import pandas
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.processor(),
+            'cpus': os.cpu_count(), 'numpy': numpy.__version__, 'pandas': pandas.__version__}
+
+
+def print_comparison(runs):
+    """ Seconds per script for every dataset and stage, with the ratio to the first script. """
+    scripts = list(dict.fromkeys(run['script'] for run in runs))
+    table = {(run['script'], run['specimens'], run['stage']): run for run in runs}
+    keys = list(dict.fromkeys((run['specimens'], run['stage']) for run in runs))
+    print(f"{'specimens':>10} {'stage':>6} " + ' '.join(f"{'s / MiB [' + str(k) + ']':>22}" for k in range(len(scripts)))
+          + (f" {'ratio':>7}" if len(scripts) > 1 else ''))
+    for specimens, stage in keys:
+        cells, first = [], None
+        for script in scripts:
+            run = table.get((script, specimens, stage))
+            if run is None:
+                cells.append(f"{'-':>22}")
+                continue
+            first = run['seconds'] if first is None else first
+            peak = '-' if run['peak_mib'] is None else f"{run['peak_mib']:.1f}"
+            cells.append(f"{run['seconds']:>12.3f} / {peak:>7}")
+        last = table.get((scripts[-1], specimens, stage))
+        ratio = f" {first / max(last['seconds'], 1e-9):>6.1f}x" if len(scripts) > 1 and last and first else ''
+        print(f"{specimens:>10} {stage:>6} " + ' '.join(cells) + ratio)
+    for k, script in enumerate(scripts):
+        print(f"[{k}] {script}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages of DNA script.py versions.")
+    parser.add_argument('--specimens', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--script', action='append', help="DNA script.py version to run (repeat to compare)")
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--sensitivity', type=float, default=0.8)
+    parser.add_argument('--related-rate', type=float, default=0.01)
+    parser.add_argument('--duplicate-rate', type=float, default=0.005)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dna_benchmark_data'))
+    parser.add_argument('--report', default='benchmark_report.json')
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc runs")
+    parser.add_argument('--compare', nargs='+', metavar='REPORT', help="print reports side by side instead of running")
+    parser.add_argument('--child', nargs=2, metavar=('SCRIPT', 'DATASET'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    stages = [stage for stage in args.stages.split(',') if stage]
+
+    if args.child:
+        print(json.dumps(run_stages(*args.child, stages, args.sensitivity, not args.no_memory)))
+        return
+    if args.compare:
+        runs = []
+        for path in args.compare:
+            with open(path, encoding='utf-8') as file:
+                runs += [dict(run, script=f"{path}: {run['script']}") for run in json.load(file)['runs']]
+        print_comparison(runs)
+        return
+
+    from synthetic import load_or_generate
+    scripts = args.script or [DEFAULT_SCRIPT]
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment(),
+              'sensitivity': args.sensitivity, 'datasets': [], 'runs': []}
+    for n in args.specimens:
+        dataset = os.path.join(args.data_dir, f'specimens_{n}_seed0')
+        print(f"Preparing dataset with {n} specimens in {dataset}")
+        description = load_or_generate(dataset, n, args.related_rate, args.duplicate_rate)
+        report['datasets'].append({key: value for key, value in description.items() if key != 'planted'}
+                                  | {'planted': len(description['planted']), 'path': dataset})
+        for script in scripts:
+            print(f"Running {script} on {n} specimens")
+            for stage, result in run_child(script, dataset, stages, args.sensitivity, not args.no_memory).items():
+                report['runs'].append({'script': os.path.abspath(script), 'specimens': n, 'stage': stage, **result})
+
+    with open(args.report, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=1)
+    print_comparison(report['runs'])
+    print(f"Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
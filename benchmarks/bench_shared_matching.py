@@ -0,0 +1,43 @@
+""" Compare the allele-sharing score on packed allele bitsets with the exact score and the pairwise loop.
+
+Usage: python benchmarks/bench_shared_matching.py [specimens ...]
+
+One allele in ten is dropped from the synthetic table to mimic degraded samples. The loop
+(with score='shared') is skipped above LOOP_LIMIT specimens and must return the same matches as
+the bitsets. Times include encoding the profiles.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from _common import load_dna_script, synthetic_long_table, timed
+from dna_engine.genotypes import encode_allele_bits
+
+LOOP_LIMIT = 500
+SENSITIVITY = 0.8
+
+
+def degraded_table(n, seed=0):
+    df = synthetic_long_table(n, related_rate=0.05, seed=seed)
+    dropped = np.random.default_rng(seed).random(len(df)) < 0.1
+    return df[~dropped].reset_index(drop=True)
+
+
+def main(sizes):
+    dna = load_dna_script()
+    print(f"{'specimens':>10} {'words':>6} {'loop s':>9} {'exact s':>9} {'shared s':>9} {'exact hits':>11} {'shared hits':>12}")
+    for n in sizes:
+        df = degraded_table(n)
+        exact, exact_time = timed(dna.find_matches, df, SENSITIVITY, set(), engine='numpy')
+        shared, shared_time = timed(dna.find_matches, df, SENSITIVITY, set(), engine='numpy', score='shared')
+        loop_time = float('nan')
+        if n <= LOOP_LIMIT:
+            loop, loop_time = timed(dna.find_matches, df, SENSITIVITY, set(), engine='loop', score='shared')
+            pd.testing.assert_frame_equal(loop, shared, check_dtype=False)
+        words = encode_allele_bits(df).words.shape[1]
+        print(f"{n:>10} {words:>6} {loop_time:>9.3f} {exact_time:>9.3f} {shared_time:>9.3f} {len(exact):>11} {len(shared):>12}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [250, 500, 5000, 20000])
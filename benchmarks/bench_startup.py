@@ -0,0 +1,98 @@
+""" Time the start of the DNA analyzer: until its window shows, and until a run has processed a file.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--script OLD/"DNA script.py" --script "DNA script.py"]
+
+Every measurement starts a new Python process and is timed from just before the process starts,
+so interpreter start-up and imports are counted. Each script runs with its own folder first on
+the path, so an older checkout uses its own dna_engine package.
+
+window: the script is started without arguments, as the application shortcut does, and stopped
+once the window has been drawn. Without a display (no DISPLAY on Linux) the window cannot be
+created, and the time is taken where the script creates it instead, which still counts all the
+imports made before the window.
+
+first file: the command line processes a folder with one small input file into an empty output
+folder, with an empty parse cache; the time is that of the whole run, engine imports included.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import REPO_DIR, write_codis_xml
+
+DEFAULT_SCRIPT = os.path.join(REPO_DIR, 'DNA script.py')
+HAS_DISPLAY = sys.platform in ('win32', 'darwin') or bool(os.environ.get('DISPLAY'))
+
+# Runs a script as __main__ with tkinter patched to print the seconds since `started` and stop
+WINDOW_CHILD = r'''
+import os, runpy, sys, time, tkinter
+started, script, has_display = float(sys.argv[1]), sys.argv[2], sys.argv[3] == '1'
+
+def stop():
+    print(f'\nSECONDS {time.time() - started}', flush=True)
+    raise SystemExit
+
+def shown(root, n=0):
+    root.update()   # draw the window
+    root.destroy()
+    stop()
+
+def created(root, *args, **kwargs):
+    stop()
+
+if has_display:
+    tkinter.Tk.mainloop = shown
+else:
+    tkinter.Tk.__init__ = created
+sys.argv = [script]
+sys.path.insert(0, os.path.dirname(script))
+runpy.run_path(script, run_name='__main__')
+'''
+
+
+def time_window(script, folder):
+    started = time.time()
+    output = subprocess.run([sys.executable, '-c', WINDOW_CHILD, str(started), script, '1' if HAS_DISPLAY else '0'],
+                            cwd=folder, capture_output=True, text=True)   # cwd: history.txt is read from there
+    if 'SECONDS ' not in output.stdout:
+        raise RuntimeError(f"{script} did not open its window:\n{output.stderr}")
+    return float(output.stdout.rpartition('SECONDS ')[2])
+
+
+def time_first_file(script, folder):
+    input_folder = os.path.join(folder, 'input')
+    with tempfile.TemporaryDirectory() as output, tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ, DNA_PARSE_CACHE=cache)
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, script, 'run', input_folder, '-o', output, '-s', '0.8', '--no-metrics'],
+                                cwd=folder, env=env, capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        if result.returncode or not os.path.exists(os.path.join(output, 'sequencing_summary.csv')):
+            raise RuntimeError(f"{script} did not process the file:\n{result.stdout}{result.stderr}")
+    return seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--script', action='append', help="version of DNA script.py to time (repeatable)")
+    parser.add_argument('--runs', type=int, default=5, help="starts per script and measurement; the median is shown")
+    args = parser.parse_args(argv)
+    scripts = [os.path.abspath(script) for script in args.script or [DEFAULT_SCRIPT]]
+    with tempfile.TemporaryDirectory() as folder:
+        os.makedirs(os.path.join(folder, 'input'))
+        write_codis_xml(os.path.join(folder, 'input', 'plate.xml'), 10)
+        print(f"median of {args.runs} starts; window: "
+              + ("until drawn" if HAS_DISPLAY else "no display, until the window is created"))
+        print(f"{'script':>40} {'window s':>9} {'first file s':>13}")
+        for script in scripts:
+            window = statistics.median(time_window(script, folder) for _ in range(args.runs))
+            first_file = statistics.median(time_first_file(script, folder) for _ in range(args.runs))
+            print(f"{os.path.relpath(script)[-40:]:>40} {window:>9.3f} {first_file:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
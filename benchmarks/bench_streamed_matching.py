@@ -0,0 +1,54 @@
+""" Peak memory of collecting all matches in memory versus streaming them to disk under a memory budget.
+
+Usage: python benchmarks/bench_streamed_matching.py [specimens [sensitivity [budget_mib]]]
+
+A low sensitivity makes the number of matches grow with the square of the specimen count. Both
+modes write DNA_matches.csv sorted by LatestMatchTime; peak traced memory is measured in a
+separate run from the timing.
+"""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from _common import peak_memory, synthetic_long_table, timed
+
+from dna_engine.index import GenotypeIndex, pair_budget
+from dna_engine.spill import MatchSpill, budget_rows
+from dna_engine.store import MATCH_FILE_COLUMNS, normalise_times
+
+
+def in_memory(index, sensitivity, path):
+    matches = index.find_matches(sensitivity).reindex(columns=MATCH_FILE_COLUMNS)
+    matches['LatestMatchTime'] = normalise_times(matches['LatestMatchTime'])
+    matches.sort_values('LatestMatchTime', kind='stable').to_csv(path, index=False)
+    return len(matches)
+
+
+def streamed(index, sensitivity, path, budget):
+    with MatchSpill(budget_rows(budget / 2), os.path.dirname(path)) as spill:
+        for chunk in index.iter_matches(sensitivity, pair_budget=pair_budget(budget / 2, len(index.profiles.loci))):
+            spill.add(chunk)
+        spill.write_csv(path)
+        return len(spill)
+
+
+def main(n_specimens, sensitivity, budget):
+    index = GenotypeIndex.build(synthetic_long_table(n_specimens))
+    print(f"{'mode':>10} {'matches':>10} {'seconds':>8} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for mode, run in (('in memory', lambda path: in_memory(index, sensitivity, path)),
+                          ('streamed', lambda path: streamed(index, sensitivity, path, budget))):
+            path = os.path.join(folder, f'{mode}.csv')
+            count, seconds = timed(run, path)
+            _, peak = peak_memory(run, path)
+            print(f"{mode:>10} {count:>10} {seconds:>8.2f} {peak:>9.1f}")
+        first, second = (pd.read_csv(os.path.join(folder, f'{mode}.csv')) for mode in ('in memory', 'streamed'))
+        assert first['LatestMatchTime'].tolist() == second['LatestMatchTime'].tolist()
+        assert len(first.merge(second)) == len(first)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 3000, float(args[1]) if len(args) > 1 else 0.08, float(args[2]) if len(args) > 2 else 64)
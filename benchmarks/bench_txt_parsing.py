@@ -0,0 +1,95 @@
+""" Compare the single-pass streaming TXT parser with the readlines() version.
+
+Usage: python benchmarks/bench_txt_parsing.py [specimens ...]
+
+Peak memory is measured with tracemalloc in a separate run, so it does not slow the timings.
+"""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from _common import load_dna_script, peak_memory, timed, write_abi_txt
+
+from dna_engine.pipeline import get_folder_file_name
+
+
+def extract_header_info(file_content):
+    """ Header fields for process_txt_file_lines, looked for in every line of the file. """
+    case_id = ""
+    reading_by = ""
+    reading_datetime = ""
+
+    for line in file_content:
+        if "Project:" in line:
+            case_id = line.split("\\")[-2]  # Assumes case ID is in a specific position in the path
+        if "Software Package:" in line:
+            reading_by = line.split(":")[1].strip()
+        if "Date/Time:" in line:
+            reading_datetime = line.split(":")[1].strip()
+    return case_id, reading_by, reading_datetime
+
+
+def process_txt_file_lines(file_path):
+    """ The original readlines() TXT parser that process_txt_file replaced. """
+    file_name = get_folder_file_name(file_path)  # Extract filename from file path
+
+    with open(file_path, 'r') as file:
+        file_content = file.readlines()
+
+    case_id, reading_by, reading_datetime = extract_header_info(file_content)
+
+    allele_data = []
+    current_specimen_id = None
+    data_start = False
+
+    for line in file_content:
+        if line.startswith("\tSample"):
+            data_start = True
+            continue
+        if data_start and line.strip():
+            parts = line.strip().split("\t")
+            clean_parts = [part.strip() for part in parts if part.strip()]
+
+            if clean_parts[0].isdigit():
+                current_specimen_id = clean_parts[1]
+                locus_name = clean_parts[2]
+                allele_values = [part for part in clean_parts[3:] if part.replace('.', '', 1).isdigit() or part in ['X', 'Y']]
+            else:
+                locus_name = clean_parts[0]
+                allele_values = [part for part in clean_parts[1:] if part.replace('.', '', 1).isdigit() or part in ['X', 'Y']]
+
+            for allele_value in allele_values:
+                allele_data.append({
+                    "CaseID": case_id,
+                    "SpecimenID": current_specimen_id,
+                    "SpecimenComment": "",
+                    "LocusName": locus_name,
+                    "ReadingBy": reading_by,
+                    "ReadingDateTime": reading_datetime,
+                    "AlleleValue": allele_value,
+                    "FileName": file_name  # Include the file name here
+                })
+
+    return pd.DataFrame(allele_data)
+
+
+def main(sizes):
+    dna = load_dna_script()
+    print(f"{'specimens':>10} {'MiB':>7} {'rows':>9} {'lines s':>8} {'lines peak':>11} {'stream s':>9} {'stream peak':>12}")
+    with tempfile.TemporaryDirectory() as folder:
+        for n in sizes:
+            path = os.path.join(folder, f'abi_{n}.txt')
+            write_abi_txt(path, n)
+            lines, lines_time = timed(process_txt_file_lines, path)
+            stream, stream_time = timed(dna.process_txt_file, path)
+            _, lines_peak = peak_memory(process_txt_file_lines, path)
+            _, stream_peak = peak_memory(dna.process_txt_file, path)
+            pd.testing.assert_frame_equal(lines, stream)
+            print(f"{n:>10} {os.path.getsize(path) / 2 ** 20:>7.1f} {len(stream):>9} {lines_time:>8.2f} {lines_peak:>11.1f} "
+                  f"{stream_time:>9.2f} {stream_peak:>12.1f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,72 @@
+""" Compare the vectorized unmelting_data pivot with the pivot_table version, and time an incremental update.
+
+Usage: python benchmarks/bench_unmelting.py [specimens ...]
+
+The incremental update re-pivots 1% of the specimens and merges them into an existing summary CSV.
+"""
+import os
+import sys
+import tempfile
+
+from _common import load_dna_script, synthetic_long_table, timed
+
+from dna_engine.summary import update_summary
+
+
+def unmelting_data_pivot_table(df):
+    """ The original pivot_table version of unmelting_data. """
+    if df.empty:
+        return df
+
+    # Step 1: Clean and standardize 'LocusName' values
+    df['LocusName'] = df['LocusName'].str.strip()  # Remove leading/trailing spaces in LocusName values
+    locus_name_map = {
+        'Amelogenin': 'AMEL',  # Mapping 'Amelogenin' to 'AMEL'
+        # Add additional mappings if necessary
+    }
+    df['LocusName'] = df['LocusName'].replace(locus_name_map)  # Apply name changes
+
+    # Step 2: Pivot the table to consolidate rows to a single line per specimen with loci as columns
+    pivoted_data = df.pivot_table(index=['FileName', 'CaseID', 'SpecimenID', 'SpecimenComment', 'ReadingBy', 'ReadingDateTime'],
+                                  columns='LocusName', values='AlleleValue', aggfunc=lambda x: list(x))
+
+    # Step 3: Reset the index for easier data handling
+    unmelted_data = pivoted_data.reset_index()
+
+    # Step 4: Fill NaN with empty lists for uniform data handling and split lists into two sorted columns
+    for locus in pivoted_data.columns:
+        # Ensure all entries are lists
+        filled_data = unmelted_data[locus].apply(lambda x: x if isinstance(x, list) else [])
+        # Split and sort the lists into two columns, handling None values correctly
+        unmelted_data[f"{locus}_1"], unmelted_data[f"{locus}_2"] = zip(
+            *filled_data.apply(lambda x: sorted(x + [None, None], key=lambda v: (v is None, v))[:2])
+        )
+
+    # Step 5: Drop the original allele list columns as they are now split and sorted
+    unmelted_data.drop(columns=pivoted_data.columns, inplace=True)
+
+    # Step 6: Sort by 'ReadingDateTime' in ascending order
+    unmelted_data = unmelted_data.sort_values('ReadingDateTime', ascending=True)
+
+    return unmelted_data
+
+
+def main(sizes):
+    dna = load_dna_script()
+    print(f"{'specimens':>10} {'rows':>9} {'pivot_table s':>14} {'vectorized s':>13} {'incremental s':>14}")
+    with tempfile.TemporaryDirectory() as folder:
+        for n in sizes:
+            df = synthetic_long_table(n)
+            old, old_time = timed(unmelting_data_pivot_table, df.copy())
+            new, new_time = timed(dna.unmelting_data, df.copy())
+            assert old.to_csv(index=False) == new.to_csv(index=False)
+
+            path = os.path.join(folder, f'summary_{n}.csv')
+            new.to_csv(path, index=False)
+            touched = df['SpecimenID'].unique()[::100]
+            _, update_time = timed(update_summary, path, df[df['SpecimenID'].isin(touched)].copy(), touched)
+            print(f"{n:>10} {len(df):>9} {old_time:>14.2f} {new_time:>13.2f} {update_time:>14.2f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,41 @@
+""" Compare the streaming (iterparse) XML parser with whole-tree parsing.
+
+Usage: python benchmarks/bench_xml_parsing.py [codis_specimens [niem_loci]]
+
+Peak memory is measured with tracemalloc in a separate run, so it does not slow the timings.
+The whole-tree NIEM parser searches the tree once per locus, so keep niem_loci modest.
+"""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from _common import load_dna_script, peak_memory, timed, write_codis_xml, write_niem_xml
+
+NS = {
+    'ns': 'urn:CODISImportFile-schema',
+    'biom': 'http://release.niem.gov/niem/domains/biometrics/5.1/',
+    'nc': 'http://release.niem.gov/niem/niem-core/5.0/'
+}
+
+
+def main(codis_specimens, niem_loci):
+    dna = load_dna_script()
+    print(f"{'file':>6} {'MiB':>8} {'tree s':>8} {'tree peak':>10} {'stream s':>9} {'stream peak':>12} {'rows':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for kind, writer, size in (('CODIS', write_codis_xml, codis_specimens), ('NIEM', write_niem_xml, niem_loci)):
+            path = os.path.join(folder, f'{kind}.xml')
+            writer(path, size)
+            tree, tree_time = timed(dna.process_xml_file, path, NS, streaming=False)
+            stream, stream_time = timed(dna.process_xml_file, path, NS)
+            _, tree_peak = peak_memory(dna.process_xml_file, path, NS, streaming=False)
+            _, stream_peak = peak_memory(dna.process_xml_file, path, NS)
+            pd.testing.assert_frame_equal(tree, stream)
+            print(f"{kind:>6} {os.path.getsize(path) / 2 ** 20:>8.1f} {tree_time:>8.2f} {tree_peak:>10.1f} "
+                  f"{stream_time:>9.2f} {stream_peak:>12.1f} {len(stream):>9}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 20000, args[1] if len(args) > 1 else 5000)
@@ -0,0 +1,175 @@
+""" Check that runs on a changing input folder leave the result files one fresh run would write.
+
+Usage: python benchmarks/check_incremental.py [--specimens 400] [--scenario NAME ...]
+
+Each scenario writes a synthetic dataset, runs the pipeline into an output folder, changes the
+input folder as an instrument or a user would, and runs it again into the same output folder.
+A fresh run over the changed folder into an empty output folder gives the expected result.
+sequencing_summary.csv, DNA_matches.csv and final_DNA_sequencing_summary.csv are compared as
+sets of rows, since the incremental runs append rows in another order; DNA_matches.csv must
+also list the same LatestMatchTime values in the same order. Exits with status 1 if any
+scenario differs.
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+
+from synthetic import generate_dataset   # imports _common, which puts the repository on the path
+from dna_engine.pipeline import main as run_pipeline
+
+RESULT_FILES = ['sequencing_summary.csv', 'DNA_matches.csv', 'final_DNA_sequencing_summary.csv']
+MIX = {'codis': 0.3, 'txt': 0.45, 'csv': 0.2, 'niem': 0.05}   # enough specimens for a few TXT files
+RELATED_RATE, DUPLICATE_RATE = 0.1, 0.05   # many matches, so matches with every kind of time occur
+
+
+def input_file(folder, fmt, number=0):
+    """ Path of the number-th input file of a format, in name order. """
+    files = sorted(entry.path for entry in os.scandir(os.path.join(folder, fmt)) if entry.is_file())
+    return files[number]
+
+
+def change_allele(path, locus='CSF1PO', value='59'):
+    """ Change the first allele of the first call of locus in a TXT export. """
+    with open(path, encoding='utf-8') as file:
+        lines = file.readlines()
+    for k, line in enumerate(lines):
+        parts = line.rstrip('\n').split('\t')
+        if locus in parts:
+            parts[parts.index(locus) + 1] = value
+            lines[k] = '\t'.join(parts) + '\n'
+            break
+    with open(path, 'w', encoding='utf-8') as file:
+        file.writelines(lines)
+
+
+def edited_file(folder):
+    """ An ingested TXT export edited in place, as when a call is corrected and the plate exported again. """
+    yield
+    change_allele(input_file(folder, 'txt'))
+
+
+def edited_original_of_copy(folder):
+    """ A TXT export copied byte for byte into a later folder, then the original edited. """
+    os.makedirs(os.path.join(folder, 'txt', 'copies'))
+    shutil.copy2(input_file(folder, 'txt'), os.path.join(folder, 'txt', 'copies', 'plate.txt'))
+    yield
+    change_allele(input_file(folder, 'txt'))
+
+
+def reexported_original_edited(folder):
+    """ A TXT export saved again with other bytes but the same rows, then the original edited. """
+    os.makedirs(os.path.join(folder, 'txt', 'reexports'))
+    reexport = os.path.join(folder, 'txt', 'reexports', 'plate.txt')
+    shutil.copyfile(input_file(folder, 'txt'), reexport)
+    with open(reexport, 'a', encoding='utf-8') as file:
+        file.write('\n')   # blank lines in the allele table are skipped
+    yield
+    change_allele(input_file(folder, 'txt'))
+
+
+def rerun_original_edited(folder):
+    """ A TXT export run again with one call that differs, then the original edited at another locus.
+
+    The re-run has the reading time of the original, so most of its rows have the keys of the
+    original's rows.
+    """
+    os.makedirs(os.path.join(folder, 'txt', 'reruns'))
+    rerun = os.path.join(folder, 'txt', 'reruns', 'plate.txt')
+    shutil.copyfile(input_file(folder, 'txt'), rerun)
+    change_allele(rerun)
+    yield
+    change_allele(input_file(folder, 'txt'), locus='TPOX', value='58')
+
+
+def overwritten_with_copy(folder):
+    """ An ingested TXT export overwritten with the bytes of another one.
+
+    The overwritten file is in a subfolder, so it is found after the other one in any run.
+    """
+    os.makedirs(os.path.join(folder, 'txt', 'later'))
+    later = os.path.join(folder, 'txt', 'later', 'plate.txt')
+    shutil.move(input_file(folder, 'txt', 1), later)
+    yield
+    shutil.copyfile(input_file(folder, 'txt'), later)
+
+
+def arriving_files(folder):
+    """ The TXT and NIEM exports arrive after the first run. The GeneMapper CSV rows, which have no
+    reading time, are there from the start, so unknown match times are stored before later ones. """
+    held = folder + '_held'
+    for fmt in ('txt', 'niem'):
+        shutil.move(os.path.join(folder, fmt), os.path.join(held, fmt))
+    yield
+    for fmt in ('txt', 'niem'):
+        shutil.move(os.path.join(held, fmt), os.path.join(folder, fmt))
+
+
+SCENARIOS = {
+    'files arriving between runs': arriving_files,
+    'edited file': edited_file,
+    'edited original of a copy': edited_original_of_copy,
+    'file overwritten with a copy': overwritten_with_copy,
+    'edited original of a re-export': reexported_original_edited,
+    'edited original of a re-run': rerun_original_edited,
+}
+
+
+def run(input_folder, output_folder):
+    os.makedirs(output_folder, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_pipeline(input_folder, output_folder, 0.5, metrics=False, cache_mib=0)
+
+
+def rows(path):
+    """ The rows of a CSV file as a sorted list, with the header first. """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return [list(df.columns)] + sorted(df.itertuples(index=False, name=None))
+
+
+def match_times(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)['LatestMatchTime'].tolist()
+
+
+def check(scenario, dataset, folder):
+    """ Run one scenario in folder; returns the result files that differ from a fresh run. """
+    input_folder = os.path.join(folder, 'input')
+    shutil.copytree(os.path.join(dataset, 'input'), input_folder)
+    steps = scenario(input_folder)
+    next(steps)
+    run(input_folder, os.path.join(folder, 'incremental'))
+    next(steps, None)
+    run(input_folder, os.path.join(folder, 'incremental'))
+    run(input_folder, os.path.join(folder, 'fresh'))
+    incremental, fresh = (lambda file_name: os.path.join(folder, 'incremental', file_name),
+                          lambda file_name: os.path.join(folder, 'fresh', file_name))
+    differing = [file_name for file_name in RESULT_FILES if rows(incremental(file_name)) != rows(fresh(file_name))]
+    if match_times(incremental('DNA_matches.csv')) != match_times(fresh('DNA_matches.csv')):
+        differing.append('the time order of DNA_matches.csv')
+    return differing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--specimens', type=int, default=400)
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help="scenario to run (repeatable; default all)")
+    args = parser.parse_args()
+    failed = False
+    with tempfile.TemporaryDirectory() as folder:
+        generate_dataset(os.path.join(folder, 'dataset'), args.specimens, RELATED_RATE, DUPLICATE_RATE, mix=MIX)
+        for name in args.scenario or SCENARIOS:
+            scenario_folder = os.path.join(folder, name.replace(' ', '_'))
+            os.makedirs(scenario_folder)
+            differing = check(SCENARIOS[name], os.path.join(folder, 'dataset'), scenario_folder)
+            failed |= bool(differing)
+            print(f"{name:>40}: {'differs in ' + ', '.join(differing) if differing else 'ok'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
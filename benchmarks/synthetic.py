@@ -0,0 +1,198 @@
+""" Synthetic instrument output for benchmarks: CODIS XML, NIEM XML, ABI 3500 TXT and GeneMapper CSV.
+
+Usage: python benchmarks/synthetic.py OUTPUT_FOLDER [--specimens N] [--related-rate R] [--duplicate-rate R] [--seed S]
+
+The input files are written to OUTPUT_FOLDER/input and the planted profiles to OUTPUT_FOLDER/truth.json.
+Related profiles copy an earlier specimen and redraw RELATED_LOCI loci; duplicate profiles copy it
+exactly under a new SpecimenID. Allele frequencies differ per locus, so common genotypes are
+shared by many specimens as in real data.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from _common import LOCI
+
+FORMAT_MIX = {'codis': 0.55, 'txt': 0.2, 'csv': 0.2, 'niem': 0.05}   # share of the specimens per format
+SPECIMENS_PER_FILE = {'codis': 500, 'txt': 96, 'csv': 96, 'niem': 1}
+RELATED_LOCI = 2
+ALLELES_PER_LOCUS = 12
+SCALES = [1000, 10000, 100000, 1000000]
+
+
+def draw_genotypes(rng, pools, weights, n):
+    """ n genotypes per locus as sorted allele pairs, shape (n, loci, 2). """
+    genotypes = np.empty((n, len(pools), 2), dtype=object)
+    for locus, (pool, weight) in enumerate(zip(pools, weights)):
+        draws = np.sort(rng.choice(len(pool), size=(n, 2), p=weight), axis=1)
+        genotypes[:, locus] = np.asarray(pool, dtype=object)[draws]
+    return genotypes
+
+
+def generate_profiles(n_specimens, related_rate=0.01, duplicate_rate=0.005, seed=0):
+    """ Allele pairs (specimens, LOCI, 2) plus the list of planted related and duplicate profiles. """
+    rng = np.random.default_rng(seed)
+    pools, weights = [], []
+    for locus in LOCI:
+        if locus == 'AMEL':
+            pools.append(['X', 'Y'])
+            weights.append(np.array([0.5, 0.5]))
+            continue
+        start = int(rng.integers(5, 20))
+        pool = [str(start + k) for k in range(ALLELES_PER_LOCUS)]
+        pool[rng.integers(ALLELES_PER_LOCUS)] += '.3'   # one microvariant per locus
+        pools.append(pool)
+        weights.append(rng.dirichlet(np.full(ALLELES_PER_LOCUS, 2.0)))
+    profiles = draw_genotypes(rng, pools, weights, n_specimens)
+
+    planted = []
+    kinds = rng.random(n_specimens)
+    for i in range(1, n_specimens):
+        if kinds[i] < duplicate_rate:
+            kind, changed = 'duplicate', []
+        elif kinds[i] < duplicate_rate + related_rate:
+            kind, changed = 'related', sorted(rng.choice(np.arange(1, len(LOCI)), RELATED_LOCI, replace=False).tolist())
+        else:
+            continue
+        source = int(rng.integers(0, i))
+        profiles[i] = profiles[source]
+        if changed:
+            redrawn = draw_genotypes(rng, [pools[k] for k in changed], [weights[k] for k in changed], 1)[0]
+            profiles[i, changed] = redrawn
+        identical = sum(1 for k in range(len(LOCI)) if list(profiles[i, k]) == list(profiles[source, k]))
+        planted.append({'kind': kind, 'specimen': specimen_id(i), 'source': specimen_id(source),
+                        'identical_loci': identical, 'loci': len(LOCI)})
+    return profiles, planted
+
+
+def specimen_id(i):
+    return f'S{i:07d}'
+
+
+def case_id(i):
+    return f'C{i // 10:06d}'
+
+
+def alleles_of(genotype):
+    """ Allele values of one call: one value for a homozygous genotype. """
+    first, second = genotype
+    return [first] if first == second else [first, second]
+
+
+def reading_time(file_number):
+    day = file_number % 365
+    return f'2024-{1 + day // 31 % 12:02d}-{1 + day % 28:02d}T{8 + file_number % 10:02d}:00:00'
+
+
+def write_codis(path, specimens, profiles, file_number):
+    when = reading_time(file_number)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n<CODISImportFile xmlns="urn:CODISImportFile-schema">\n')
+        for i in specimens:
+            file.write(f'<SPECIMEN CASEID="{case_id(i)}"><SPECIMENID>{specimen_id(i)}</SPECIMENID>'
+                       f'<SPECIMENCOMMENT>synthetic</SPECIMENCOMMENT>\n')
+            for locus, genotype in zip(LOCI, profiles[i]):
+                alleles = ''.join(f'<ALLELE><ALLELEVALUE>{value}</ALLELEVALUE></ALLELE>' for value in alleles_of(genotype))
+                file.write(f'<LOCUS><LOCUSNAME>{locus}</LOCUSNAME><READINGBY>ABI3500</READINGBY>'
+                           f'<READINGDATETIME>{when}</READINGDATETIME>{alleles}</LOCUS>\n')
+            file.write('</SPECIMEN>\n')
+        file.write('</CODISImportFile>\n')
+
+
+def write_niem(path, specimens, profiles, file_number):
+    (i,) = specimens
+    when = reading_time(file_number) + 'Z'
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   '<DNADataTransaction xmlns:biom="http://release.niem.gov/niem/domains/biometrics/5.1/" '
+                   'xmlns:nc="http://release.niem.gov/niem/niem-core/5.0/">\n'
+                   f'<nc:DocumentIdentification><nc:IdentificationID>{case_id(i)}</nc:IdentificationID></nc:DocumentIdentification>\n'
+                   f'<biom:DNASample><biom:DNASourceIdentification><nc:IdentificationID>{specimen_id(i)}</nc:IdentificationID>'
+                   '</biom:DNASourceIdentification>\n<biom:DNADevice><biom:DeviceName>RapidHIT</biom:DeviceName></biom:DNADevice>\n'
+                   '<biom:DNAProfile>\n')
+        for locus, genotype in zip(LOCI, profiles[i]):
+            alleles = ''.join(f'<biom:DNAAllele><biom:DNAAlleleCall1Text>{value}</biom:DNAAlleleCall1Text></biom:DNAAllele>'
+                              for value in alleles_of(genotype))
+            file.write(f'<biom:DNALocus><biom:DNALocusName>{locus}</biom:DNALocusName>'
+                       f'<biom:ProcessUTCDate>{when}</biom:ProcessUTCDate>{alleles}</biom:DNALocus>\n')
+        file.write('</biom:DNAProfile></biom:DNASample>\n</DNADataTransaction>\n')
+
+
+def write_txt(path, specimens, profiles, file_number):
+    """ ABI 3500 export: header, then the first locus of each sample on a numbered row. """
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(f'Project: D:\\Projects\\{case_id(specimens[0])}\\plate{file_number}.txt\n'
+                   'Software Package: GeneMapper ID-X\n'
+                   f'Date/Time: {reading_time(file_number)[:10]}\n\n'
+                   '\tSample Name\tMarker\tAllele 1\tAllele 2\n')
+        for number, i in enumerate(specimens, start=1):
+            for k, (locus, genotype) in enumerate(zip(LOCI, profiles[i])):
+                alleles = '\t'.join(alleles_of(genotype))
+                prefix = f'{number}\t{specimen_id(i)}\t' if k == 0 else '\t'
+                file.write(f'{prefix}{locus}\t{alleles}\n')
+
+
+def write_csv(path, specimens, profiles, file_number):
+    """ GeneMapper export; a homozygous call leaves Allele 2 blank (a single space). """
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('Sample File,Sample Name,Marker,Allele 1,Allele 2\n')
+        for i in specimens:
+            for locus, (first, second) in zip(LOCI, profiles[i]):
+                file.write(f'{specimen_id(i)},{case_id(i)} plate{file_number},{locus},{first},'
+                           f'{" " if first == second else second}\n')
+
+
+WRITERS = {'codis': (write_codis, '.xml'), 'niem': (write_niem, '.xml'), 'txt': (write_txt, '.txt'), 'csv': (write_csv, '.csv')}
+
+
+def generate_dataset(folder, n_specimens, related_rate=0.01, duplicate_rate=0.005, seed=0, mix=None):
+    """ Write a dataset to folder (input files under folder/input) and return its description. """
+    mix = mix or FORMAT_MIX
+    profiles, planted = generate_profiles(n_specimens, related_rate, duplicate_rate, seed)
+    rng = np.random.default_rng(seed + 1)
+    formats = list(mix)
+    assigned = rng.choice(len(formats), size=n_specimens, p=np.array([mix[f] for f in formats]) / sum(mix.values()))
+
+    file_number, files = 0, {}
+    for code, fmt in enumerate(formats):
+        writer, extension = WRITERS[fmt]
+        specimens = np.flatnonzero(assigned == code).tolist()
+        os.makedirs(os.path.join(folder, 'input', fmt), exist_ok=True)
+        per_file = SPECIMENS_PER_FILE[fmt]
+        for start in range(0, len(specimens), per_file):
+            path = os.path.join(folder, 'input', fmt, f'{fmt}_{file_number:06d}{extension}')
+            writer(path, specimens[start:start + per_file], profiles, file_number)
+            file_number += 1
+        files[fmt] = -(-len(specimens) // per_file)
+
+    description = {'specimens': n_specimens, 'loci': len(LOCI), 'related_rate': related_rate,
+                   'duplicate_rate': duplicate_rate, 'seed': seed, 'files': files, 'planted': planted}
+    with open(os.path.join(folder, 'truth.json'), 'w', encoding='utf-8') as file:
+        json.dump(description, file, indent=1)
+    return description
+
+
+def load_or_generate(folder, n_specimens, related_rate=0.01, duplicate_rate=0.005, seed=0):
+    """ Reuse the dataset in folder if it was generated with the same parameters. """
+    truth_path = os.path.join(folder, 'truth.json')
+    if os.path.exists(truth_path):
+        with open(truth_path, encoding='utf-8') as file:
+            description = json.load(file)
+        if [description.get(key) for key in ('specimens', 'related_rate', 'duplicate_rate', 'seed')] == \
+                [n_specimens, related_rate, duplicate_rate, seed]:
+            return description
+    return generate_dataset(folder, n_specimens, related_rate, duplicate_rate, seed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic dataset of instrument output files.")
+    parser.add_argument('folder')
+    parser.add_argument('--specimens', type=int, default=SCALES[0])
+    parser.add_argument('--related-rate', type=float, default=0.01)
+    parser.add_argument('--duplicate-rate', type=float, default=0.005)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    result = generate_dataset(args.folder, args.specimens, args.related_rate, args.duplicate_rate, args.seed)
+    print(f"Wrote {sum(result['files'].values())} files ({result['files']}) with {len(result['planted'])} planted profiles")
@@ -0,0 +1 @@
+""" Processing engine for the DNA analyzer: genotype encoding and matching. """
@@ -0,0 +1,73 @@
+""" Dictionary-encoded (categorical) columns of the long allele table.
+
+Parsed files and rows read from the store keep their text columns as pandas categoricals: each
+distinct value is held once and the rows hold small integer codes. Text columns get their
+categories in sorted order, so sorting and grouping on the codes gives the same order as on the
+strings. AlleleValue codes start with STANDARD_ALLELES, so the usual alleles have the same code in
+every frame (X = 0, Y = 1, 9 = 82, 9.3 = 85); other values get codes after those.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+TEXT_COLUMNS = ['FileName', 'CaseID', 'SpecimenID', 'SpecimenComment', 'LocusName', 'ReadingBy', 'ReadingDateTime',
+                'SourceFile']
+STANDARD_ALLELES = ['X', 'Y'] + [f'{repeat}{suffix}' for repeat in range(1, 100)
+                                 for suffix in [''] + [f'.{step}' for step in range(1, 10)]]
+_STANDARD = pd.Index(STANDARD_ALLELES, dtype=object)
+
+
+def allele_column(values):
+    """ Categorical allele values: STANDARD_ALLELES first, then other values in order of appearance. """
+    values = pd.Series(values, dtype=object) if not isinstance(values, pd.Series) else values.astype(object)
+    extra = pd.unique(values[values.notna() & ~values.isin(_STANDARD)])
+    return pd.Categorical(values, categories=_STANDARD.append(pd.Index(extra, dtype=object)))
+
+
+def compact_rows(df):
+    """ Copy of df with its text and allele columns dictionary-encoded (columns it lacks are skipped). """
+    df = df.copy()
+    for column in TEXT_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object).astype('category')
+    if 'AlleleValue' in df.columns and not isinstance(df['AlleleValue'].dtype, pd.CategoricalDtype):
+        df['AlleleValue'] = pd.Series(allele_column(df['AlleleValue']), index=df.index)
+    return df
+
+
+def concat_rows(frames):
+    """ pd.concat of compacted frames that keeps the columns categorical (pd.concat falls back to
+    object columns when the categories differ). Allele codes of STANDARD_ALLELES stay fixed. """
+    frames = [frame for frame in frames if len(frame.columns)]
+    if not frames:
+        return pd.DataFrame()
+    combined = pd.concat(frames, ignore_index=True)
+    for column in combined.columns:
+        parts = [frame[column] for frame in frames if column in frame.columns]
+        if len(parts) == len(frames) and all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            combined[column] = union_categoricals(parts, sort_categories=column != 'AlleleValue', ignore_order=True)
+    return combined
+
+
+def map_categories(values, func):
+    """ Apply func to the categories of a categorical Series (e.g. to clean names), merging
+    categories that become equal; the result is categorical with sorted categories. """
+    mapped = pd.Index(func(pd.Series(values.cat.categories, dtype=object)), dtype=object)
+    inverse, categories = pd.factorize(mapped, sort=True)
+    codes = values.cat.codes.to_numpy()
+    codes = np.where(codes < 0, -1, inverse[np.maximum(codes, 0)] if len(inverse) else -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=values.index, name=values.name)
+
+
+def sorted_codes(values):
+    """ Like pd.factorize(values, sort=True) in string order, using the dictionary of a
+    categorical column instead of hashing every row. """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.factorize(values, sort=True)
+    values = values.cat.remove_unused_categories()
+    categories = pd.Index(values.cat.categories, dtype=object)
+    order = np.argsort(categories.astype(str), kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    codes = values.cat.codes.to_numpy()
+    return np.where(codes < 0, -1, rank[np.maximum(codes, 0)] if len(rank) else -1), categories[order]
@@ -0,0 +1,89 @@
+""" Command line of the DNA analyzer (see parse_args): run or watch an input folder, or search profiles. """
+import argparse
+import os
+
+from dna_engine.parsecache import DEFAULT_CACHE_MIB
+from dna_engine.pipeline import SCORES, ProfileSearch, main, watch
+
+
+def parse_profile(text):
+    """ Profile dict from 'LOCUS=a,b;LOCUS=c' as given on the command line. """
+    profile = {}
+    for item in text.split(';'):
+        if item.strip():
+            locus, _, alleles = item.partition('=')
+            profile[locus.strip()] = [allele.strip() for allele in alleles.split(',') if allele.strip()]
+    return profile
+
+def print_search(specimen_id, result, milliseconds):
+    print(f"{specimen_id or 'Profile'}: {len(result)} matches in {milliseconds:.2f} ms")
+    if not result.empty:
+        print(result.to_string(index=False))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='DNA script.py', description="Process DNA sequencing files without the GUI.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('run', "process the input folder once"), ('watch', "keep processing new files as they arrive")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('input', help="folder with the XML, TXT and CSV files")
+        command.add_argument('-o', '--output', help="folder for the result files (default: the parent of the input folder)")
+        command.add_argument('-s', '--sensitivity', type=float, help="match sensitivity 0-1 (default: from settings.csv)")
+        command.add_argument('-w', '--workers', type=int, default=1, help="processes used to parse new files")
+        command.add_argument('--no-hash', action='store_true', help="do not hash files to detect duplicate copies")
+        command.add_argument('--no-metrics', action='store_true', help="do not write run_metrics.json")
+        command.add_argument('-m', '--memory-budget', type=float,
+                             help="MiB for matching: stream matches to disk instead of holding them in memory")
+        command.add_argument('--cache-mib', type=float, default=DEFAULT_CACHE_MIB,
+                             help=f"size of the parse cache in MiB, 0 to turn it off (default: {DEFAULT_CACHE_MIB})")
+        command.add_argument('--prune-folders', action='store_true',
+                             help="do not list folders unchanged since the last scan (misses files rewritten in place)")
+        command.add_argument('--score', choices=SCORES, default='exact',
+                             help="exact: share of identical loci (default); shared: share of shared alleles")
+    commands.choices['run'].add_argument('--full', action='store_true',
+                                         help="match all stored specimens and rebuild the final summary")
+    commands.choices['run'].add_argument('--match-workers', type=int, default=1,
+                                         help="with --full, processes used to score all pairs in tiles")
+    commands.choices['run'].add_argument('--profile', action='store_true', help="save a cProfile of the run to run_profile.prof")
+    commands.choices['watch'].add_argument('-i', '--interval', type=float, default=2.0, help="seconds between folder polls")
+    search = commands.add_parser('search', help="find the stored specimens most similar to one profile")
+    search.add_argument('output', help="output folder with the stored data (sequencing_summary.sqlite)")
+    query = search.add_mutually_exclusive_group(required=True)
+    query.add_argument('-f', '--file', help="XML, TXT or CSV file with the profile(s) to search")
+    query.add_argument('-p', '--profile', help="profile as 'LOCUS=a,b;LOCUS=c'")
+    search.add_argument('--specimen', help="with --file, only search this SpecimenID")
+    search.add_argument('-k', '--top', type=int, default=10, help="number of specimens to list (default: 10)")
+    return parser.parse_args(argv)
+
+def run_cli(argv):
+    """ Command line entry point; returns the exit code. """
+    args = parse_args(argv)
+    if args.command == 'search':
+        return run_search(args)
+    if not os.path.isdir(args.input):
+        print(f"Input folder {args.input} does not exist.")
+        return 2
+    if args.command == 'run':
+        main(args.input, args.output, args.sensitivity, incremental=not args.full, workers=args.workers,
+             hash_files=not args.no_hash, incremental_summary=not args.full, metrics=not args.no_metrics,
+             profile=args.profile, match_workers=args.match_workers, memory_budget=args.memory_budget,
+             cache_mib=args.cache_mib, prune_folders=args.prune_folders, score=args.score)
+        print("Processing completed successfully!")
+    else:
+        watch(args.input, args.output, args.sensitivity, args.interval, args.workers, not args.no_hash,
+              metrics=not args.no_metrics, memory_budget=args.memory_budget, cache_mib=args.cache_mib,
+              prune_folders=args.prune_folders, score=args.score)
+    return 0
+
+def run_search(args):
+    try:
+        searcher = ProfileSearch(args.output)
+        if args.file:
+            results = searcher.search_file(args.file, args.top, args.specimen)
+        else:
+            results = {None: searcher.search(parse_profile(args.profile), args.top)}
+    except (OSError, KeyError) as e:
+        print(e)
+        return 2
+    for specimen_id, (result, milliseconds) in results.items():
+        print_search(specimen_id, result, milliseconds)
+    return 0
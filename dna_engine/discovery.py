@@ -0,0 +1,166 @@
+""" Discovery of input files: folders are listed with os.scandir on a thread pool, ahead of the caller. """
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from dna_engine.manifest import relative_key
+
+DISCOVERY_THREADS = 8
+RACY_NS = 2 * 10 ** 9   # folders changed this recently may still change without a new modification time
+
+
+def modification_time(path):
+    """ st_mtime_ns of a path or os.DirEntry, None if it cannot be stat'ed. """
+    try:
+        return path.stat().st_mtime_ns if isinstance(path, os.DirEntry) else os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def parent_key(key):
+    """ Key of the folder holding the folder key (not the input folder). """
+    return key.rpartition('/')[0] or '.'
+
+
+class Listing:
+    """ The listing of one folder: run on the pool once submitted, else by whoever needs it first. """
+
+    def __init__(self, walk, path, key, mtime):
+        self.walk = walk
+        self.args = (path, key, mtime)
+        self.future = None
+
+    def result(self):
+        if self.future is None:
+            return self.walk.list_folder(*self.args)
+        return self.future.result()
+
+
+class FolderWalk:
+    """ Input files under a folder, yielded in os.walk order while the folders are listed concurrently.
+
+    Iterating yields (path, name, file type, stat) for every file whose extension is a key of
+    file_types; stat is None when the file could not be stat'ed. Each folder is listed once with
+    os.scandir, which filters the entries on their extension and stats the matching files. Up to
+    `threads` listings are kept queued on a thread pool, taken first from the subfolders found by
+    the pool and then from those next in walk order, so the walk runs ahead of the caller, which
+    gets the first files while deeper folders are still being listed. A folder the caller reaches
+    before it was queued is listed on the caller's thread, without the overhead of the pool.
+    Symbolic links to folders are not followed, and unreadable folders are skipped, as in os.walk.
+
+    known_folders maps folder keys (see relative_key; '.' is the input folder) to the modification
+    time they had at an earlier walk. The modification time of a folder changes when an entry is
+    added, removed or renamed in it, so a known folder with the same time is not listed again: its
+    files are skipped and only its known subfolders are walked. Files rewritten in place in such a
+    folder are not noticed.
+
+    After a complete walk, folders maps the key of every folder to its modification time, to pass
+    as known_folders next time. It is None for folders that must be listed again: folders changed
+    in the last RACY_NS nanoseconds (a file added now could keep the same time), unreadable ones,
+    and those passed to forget(). They are kept, so the subfolders of a skipped folder are complete.
+    """
+
+    def __init__(self, folder_path, file_types, threads=DISCOVERY_THREADS, known_folders=None):
+        self.folder_path = folder_path
+        self.file_types = file_types
+        self.threads = threads
+        self.known = dict(known_folders or {})
+        self.known_children = {}
+        for key in self.known:
+            if key != '.':
+                self.known_children.setdefault(parent_key(key), []).append(key)
+        self.folders = {}
+        self.listed = self.pruned = 0
+        self.complete = False
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.pool = None
+
+    def __iter__(self):
+        mtime = modification_time(self.folder_path)
+        if mtime is None:
+            return
+        self.pool = ThreadPoolExecutor(max_workers=self.threads)
+        try:
+            pending = [Listing(self, self.folder_path, '.', mtime)]
+            while pending:
+                key, mtime, listed, files, subfolders = pending.pop().result()
+                self.folders[key] = mtime   # in walk order, so known_children keep the listing order
+                if listed:
+                    self.listed += 1
+                else:
+                    self.pruned += 1
+                pending.extend(reversed(subfolders))
+                for listing in islice(reversed(pending), 4 * self.threads):   # next in walk order first
+                    if not self.submit(listing):
+                        break
+                yield from files
+            self.complete = True
+        finally:
+            self.stopped.set()
+            self.pool.shutdown(cancel_futures=True)
+
+    def forget(self, file_path):
+        """ Have the folder of file_path (e.g. of a file that failed) listed again next time. """
+        self.folders[relative_key(self.folder_path, os.path.dirname(file_path))] = None
+
+    def submit(self, listing):
+        """ Queue a listing on the pool unless `threads` are queued already; False if the pool is full. """
+        if listing.future is not None:
+            return True
+        with self.lock:
+            if self.queued >= self.threads:
+                return False
+            self.queued += 1
+        listing.future = self.pool.submit(self._run, listing)
+        return True
+
+    def _run(self, listing):
+        with self.lock:
+            self.queued -= 1
+        return self.list_folder(*listing.args)
+
+    def list_folder(self, path, key, mtime):
+        """ (key, mtime to remember, whether listed, files, subfolder Listings) of one folder. """
+        if self.stopped.is_set():
+            return key, None, False, [], []
+        if mtime is not None and self.known.get(key) == mtime:
+            subfolders = []
+            for child in self.known_children.get(key, ()):
+                child_path = os.path.join(self.folder_path, *child.split('/'))
+                subfolders.append(Listing(self, child_path, child, modification_time(child_path)))
+            for listing in subfolders:
+                self.submit(listing)
+            return key, mtime, False, [], subfolders
+
+        listed_at = time.time_ns()
+        files, subfolders = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        is_folder = entry.is_dir()
+                    except OSError:
+                        is_folder = False
+                    if is_folder:
+                        if not entry.is_symlink():
+                            child = entry.name if key == '.' else key + '/' + entry.name
+                            subfolders.append(Listing(self, entry.path, child, modification_time(entry)))
+                        continue
+                    file_type = self.file_types.get(os.path.splitext(entry.name)[1])
+                    if file_type:
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            stat = None
+                        files.append((entry.path, entry.name, file_type, stat))
+        except OSError:
+            files, subfolders = [], []
+        for listing in subfolders:
+            self.submit(listing)
+        if mtime is not None and mtime >= listed_at - RACY_NS:
+            mtime = None
+        return key, mtime, True, files, subfolders
@@ -0,0 +1,224 @@
+""" Fixed-width integer genotype encoding used by the matching engine. """
+import numpy as np
+import pandas as pd
+
+from dna_engine.categorical import sorted_codes
+
+# Allele slot sentinels
+MISSING = -1   # empty second slot of a single-allele call
+ABSENT = -2    # locus was not typed for this specimen
+OVERFLOW = -3  # slot 0 holds a composite code for a call with more than two alleles
+
+META_COLUMNS = ['CaseID', 'SpecimenComment', 'ReadingBy', 'ReadingDateTime']
+
+
+class GenotypeMatrix:
+    """ Specimens x loci x 2 allele codes, plus the per-specimen fields written to match rows. """
+
+    def __init__(self, specimen_ids, loci, allele_values, alleles, meta):
+        self.specimen_ids = list(specimen_ids)      # sorted, same order as groupby('SpecimenID')
+        self.loci = list(loci)                      # sorted locus names
+        self.allele_values = list(allele_values)    # allele token for each code
+        self.alleles = alleles                      # int32 array (specimens, loci, 2)
+        self.meta = meta                            # DataFrame with META_COLUMNS, one row per specimen
+
+    def __len__(self):
+        return len(self.specimen_ids)
+
+    def locus_counts(self):
+        """ Number of typed loci per specimen (the MatchScore denominator). """
+        return (self.alleles[:, :, 0] != ABSENT).sum(axis=1)
+
+    def genotype_keys(self):
+        """ One int64 code per (specimen, locus) genotype; untyped loci are -1. """
+        width = len(self.allele_values) - OVERFLOW
+        slots = self.alleles.astype(np.int64) - OVERFLOW
+        keys = slots[:, :, 0] * width + slots[:, :, 1]
+        keys[self.alleles[:, :, 0] == ABSENT] = -1
+        return keys
+
+
+class AlleleBits:
+    """ Each specimen's alleles as bitsets over per-locus allele dictionaries, packed into uint64 words.
+
+    Every (locus, allele) seen in the data owns one bit; the bits of a locus are contiguous, but a
+    locus may straddle two words. The number of alleles two specimens share is then the popcount
+    of the AND of their words, whatever the number of loci.
+    """
+
+    def __init__(self, specimen_ids, words, counts):
+        self.specimen_ids = list(specimen_ids)   # same order as encode_profiles
+        self.words = words                       # uint64 array (specimens, words)
+        self.counts = counts                     # alleles per specimen (the allele-sharing denominator)
+
+    def __len__(self):
+        return len(self.specimen_ids)
+
+
+def popcount(words):
+    """ Number of set bits in each element of a uint64 array. """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    return _BYTE_BITS[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+_BYTE_BITS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def query_keys(gm, profile):
+    """ Genotype keys of one profile {locus: [alleles]} over gm.loci, and its number of typed loci.
+
+    Alleles are compared in the order given, as in encode_profiles. Loci of the profile that gm
+    has never seen still count as typed, and alleles gm has never seen give a key (-2) that
+    equals no stored genotype. Untyped loci are -1.
+    """
+    lookup = {value: code for code, value in enumerate(gm.allele_values)}
+    width = len(gm.allele_values) - OVERFLOW
+    keys = np.full(len(gm.loci), -1, dtype=np.int64)
+    positions = {locus: k for k, locus in enumerate(gm.loci)}
+    typed = 0
+    for locus, alleles in profile.items():
+        alleles = [str(allele) for allele in alleles]
+        if not alleles:
+            continue
+        typed += 1
+        if locus not in positions:
+            continue
+        if len(alleles) > 2:
+            slots = (lookup.get('|'.join(alleles)), OVERFLOW)
+        else:
+            slots = (lookup.get(alleles[0]), lookup.get(alleles[1]) if len(alleles) == 2 else MISSING)
+        if None in slots:
+            keys[positions[locus]] = -2
+        else:
+            keys[positions[locus]] = (slots[0] - OVERFLOW) * width + (slots[1] - OVERFLOW)
+    return keys, typed
+
+
+def profiles_from_rows(df):
+    """ {SpecimenID: {locus: [alleles]}} from long-format rows such as a parsed input file. """
+    profiles = {}
+    for specimen_id, locus, allele in df[['SpecimenID', 'LocusName', 'AlleleValue']].itertuples(index=False, name=None):
+        if pd.notna(specimen_id) and pd.notna(locus):
+            profiles.setdefault(specimen_id, {}).setdefault(locus, []).append(allele)
+    return profiles
+
+
+def allele_tokens(values):
+    """ Factorize allele values into (codes, tokens) keyed on their string form. """
+    raw_codes, uniques = pd.factorize(values)
+    tokens = [str(value) for value in uniques] + ['nan']   # code -1 (NaN) picks the last entry
+    token_codes, token_values = pd.factorize(pd.Index(tokens, dtype=object))
+    return token_codes[raw_codes], list(token_values)
+
+
+def encode_profiles(df):
+    """ Encode a long-format allele table into a GenotypeMatrix.
+
+    Alleles keep the order they appear in within each (SpecimenID, LocusName) group, so two
+    loci encode equal exactly when the allele lists find_matches compares are equal.
+    """
+    data = df.dropna(subset=['SpecimenID', 'LocusName'])
+    if data.empty:
+        return GenotypeMatrix([], [], [], np.empty((0, 0, 2), dtype=np.int32), pd.DataFrame(columns=META_COLUMNS))
+
+    spec_codes, specimen_ids = sorted_codes(data['SpecimenID'])
+    locus_codes, loci = sorted_codes(data['LocusName'])
+    allele_codes, allele_values = allele_tokens(data['AlleleValue'])
+
+    n, n_loci = len(specimen_ids), len(loci)
+    order = np.lexsort((locus_codes, spec_codes))   # stable, keeps file order inside a group
+    group_key = spec_codes[order].astype(np.int64) * n_loci + locus_codes[order]
+    allele_codes = allele_codes[order]
+
+    starts = np.flatnonzero(np.r_[True, group_key[1:] != group_key[:-1]])
+    sizes = np.diff(np.r_[starts, len(group_key)])
+    group_of_row = np.repeat(np.arange(len(starts)), sizes)
+    rank = np.arange(len(group_key)) - starts[group_of_row]
+
+    alleles = np.full((n, n_loci, 2), ABSENT, dtype=np.int32)
+    group_spec, group_locus = np.divmod(group_key[starts], n_loci)
+    alleles[group_spec, group_locus] = MISSING
+
+    small = sizes[group_of_row] <= 2
+    alleles[group_key[small] // n_loci, group_key[small] % n_loci, rank[small]] = allele_codes[small]
+
+    # Calls with more than two alleles (e.g. a specimen typed twice) get one composite code
+    composite = {}
+    for start, size in zip(starts[sizes > 2], sizes[sizes > 2]):
+        token = '|'.join(allele_values[code] for code in allele_codes[start:start + size])
+        if token not in composite:
+            composite[token] = len(allele_values)
+            allele_values.append(token)
+        spec, locus = divmod(int(group_key[start]), n_loci)
+        alleles[spec, locus] = (composite[token], OVERFLOW)
+
+    # Same two-step 'first' as find_matches: first per locus, then first over sorted loci
+    meta = (data.groupby(['SpecimenID', 'LocusName'])[META_COLUMNS].first()
+                .groupby(level=0).first()
+                .reindex(specimen_ids)
+                .reset_index(drop=True))
+
+    return GenotypeMatrix(specimen_ids, loci, allele_values, alleles, meta)
+
+
+def encode_allele_bits(df):
+    """ Encode a long-format allele table into AlleleBits, with the specimens of encode_profiles(df).
+
+    Alleles are compared on their string form, as in encode_profiles, but as sets: order and
+    repeats do not matter, and a specimen typed twice at a locus has the union of both calls.
+    Missing allele values set no bit.
+    """
+    data = df.dropna(subset=['SpecimenID', 'LocusName'])
+    if data.empty:
+        return AlleleBits([], np.zeros((0, 1), dtype=np.uint64), np.zeros(0, dtype=np.int64))
+
+    spec_codes, specimen_ids = sorted_codes(data['SpecimenID'])
+    locus_codes, _ = sorted_codes(data['LocusName'])
+    allele_codes, allele_values = allele_tokens(data['AlleleValue'])
+    typed = data['AlleleValue'].notna().to_numpy()
+
+    # One bit per distinct (locus, allele), numbered in locus order
+    pair_keys = locus_codes[typed].astype(np.int64) * len(allele_values) + allele_codes[typed]
+    bit_keys, bits = np.unique(pair_keys, return_inverse=True)
+    cells = np.unique(spec_codes[typed].astype(np.int64) * max(len(bit_keys), 1) + bits)
+    specimens, bits = np.divmod(cells, max(len(bit_keys), 1))
+
+    words = np.zeros((len(specimen_ids), max(1, -(-len(bit_keys) // 64))), dtype=np.uint64)
+    np.bitwise_or.at(words, (specimens, bits // 64), np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64)))
+    counts = np.bincount(specimens, minlength=len(specimen_ids))
+    return AlleleBits(specimen_ids, words, counts)
+
+
+def merge_profiles(base, update, replaced=None):
+    """ Add the specimens of update to base, replacing any with the same SpecimenID.
+
+    replaced, if given, lists the specimens of base to drop instead; it must include those of
+    update, and the ones with no profile in update are removed.
+
+    Allele codes of base are kept; update is remapped onto base's allele dictionary. The result
+    is a new GenotypeMatrix in sorted SpecimenID order.
+    """
+    loci = sorted(set(base.loci) | set(update.loci))
+    allele_values = list(base.allele_values)
+    lookup = {value: code for code, value in enumerate(allele_values)}
+    for value in update.allele_values:
+        if value not in lookup:
+            lookup[value] = len(allele_values)
+            allele_values.append(value)
+    remap = np.array([lookup[value] for value in update.allele_values], dtype=np.int32)
+    update_codes = np.where(update.alleles >= 0, remap[np.maximum(update.alleles, 0)], update.alleles)
+
+    def widen(gm_loci, codes):
+        alleles = np.full((len(codes), len(loci), 2), ABSENT, dtype=np.int32)
+        alleles[:, [loci.index(locus) for locus in gm_loci]] = codes
+        return alleles
+
+    keep = ~pd.Index(base.specimen_ids, dtype=object).isin(update.specimen_ids if replaced is None else list(replaced))
+    base_alleles = widen(base.loci, base.alleles[keep])
+    update_alleles = widen(update.loci, update_codes)
+    specimen_ids = np.array([*np.asarray(base.specimen_ids, dtype=object)[keep], *update.specimen_ids], dtype=object)
+    order = np.argsort(specimen_ids, kind='stable')
+    alleles = np.concatenate([base_alleles, update_alleles])[order]
+    meta = pd.concat([base.meta[keep], update.meta], ignore_index=True).iloc[order].reset_index(drop=True)
+    return GenotypeMatrix(specimen_ids[order], loci, allele_values, alleles, meta)
@@ -0,0 +1,263 @@
+""" The window of the DNA analyzer.
+
+Only tkinter and the job runner are imported with this module. The engine (dna_engine.pipeline,
+with pandas and NumPy) is imported by the first run, or on a background thread once the window
+shows (see warm_up), so the window does not wait for it.
+"""
+import importlib
+import os
+import threading
+import tkinter as tk
+from tkinter import filedialog, messagebox, scrolledtext, ttk
+
+from dna_engine.jobs import NO_CONTROL, Cancelled, JobRunner
+
+STAGE_NAMES = {'ingest': "Reading files", 'dedup': "Removing duplicates", 'pivot': "Updating the summary",
+               'matching': "Finding matches", 'write': "Saving results"}
+POLL_MS = 100   # how often the window takes the log and progress of the running job
+WARM_UP_MS = 200   # after the window shows, import the engine in the background (DNA_WARM_UP=0: at the first run)
+WARM_UP = os.environ.get('DNA_WARM_UP', '1') != '0'
+
+def run_script(input_folder_path, output_folder_path, sensitivity, control=NO_CONTROL):
+    try:
+        from dna_engine.pipeline import main   # waits for warm_up if it is still importing
+        main(input_folder_path, output_folder_path, sensitivity, control=control)
+        print("Processing completed successfully!")
+    except Cancelled:
+        print("Processing cancelled; nothing was saved.")
+        raise
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        raise   # the job ends as failed
+        
+def choose_folder(entry, other_entry):
+    folder_path = filedialog.askdirectory()
+    if folder_path:
+        entry.delete(0, tk.END)
+        entry.insert(0, folder_path)
+        # Update the history file based on which entry was updated
+        if entry == input_folder_path_entry:
+            save_history(folder_path, other_entry.get(), sensitivity_entry.get())
+        else:
+            save_history(other_entry.get(), folder_path, sensitivity_entry.get())
+
+def warm_up():
+    """ Import the engine on a daemon thread, so a run started soon after does not wait for pandas and NumPy. """
+    def load():
+        try:
+            importlib.import_module('dna_engine.pipeline')
+        except Exception:
+            pass   # the run reports it
+    threading.Thread(target=load, daemon=True).start()
+
+def start_thread():
+    """ Queue a run with the current settings; it starts when the jobs before it are done. """
+    input_folder_path = input_folder_path_entry.get()
+    output_folder_path = output_folder_path_entry.get()
+    sensitivity = sensitivity_entry.get()  # Read sensitivity from entry as a string
+    if not os.path.exists(input_folder_path):
+        messagebox.showerror("Error", "The specified input folder path does not exist.")
+        return
+    try:
+        value = float(sensitivity)
+    except ValueError:
+        messagebox.showerror("Error", "The match sensitivity must be a number between 0 and 1.")
+        return
+    save_history(input_folder_path, output_folder_path, sensitivity)  # Save the current settings to history
+    waiting = runner.submit(input_folder_path, lambda control: run_script(input_folder_path, output_folder_path, value, control))
+    if waiting:
+        print(f"Queued {input_folder_path}; it starts after {waiting} earlier job(s).")
+
+def cancel_job():
+    runner.cancel()
+    print("Cancelling the current job...")
+
+def append_log(text):
+    log.configure(state='normal')
+    log.insert(tk.END, text)
+    log.configure(state='disabled')
+    log.yview(tk.END)
+
+def poll_jobs():
+    """ Show the log, progress and status of the jobs; runs on the Tk thread every POLL_MS ms. """
+    for event in runner.drain():
+        if event[0] == 'log':
+            append_log(event[1])
+        elif event[0] == 'progress':
+            _, stage, done, total = event
+            stage_label.config(text=STAGE_NAMES.get(stage, stage) + (f" ({done} of {total})" if total else f" ({done})" if done else ''))
+            if total:
+                progress_bar.stop()
+                progress_bar.config(mode='determinate', maximum=total, value=done)
+            elif str(progress_bar.cget('mode')) != 'indeterminate':
+                progress_bar.config(mode='indeterminate', value=0)
+                progress_bar.start(10)
+        elif event[0] == 'start':
+            _, name, queued = event
+            stage_label.config(text=f"Starting {name}" + (f" ({queued} queued)" if queued else ''))
+            cancel_button.config(state='normal')
+        elif event[0] == 'end':
+            _, name, status = event
+            progress_bar.stop()
+            progress_bar.config(mode='determinate', value=0)
+            stage_label.config(text={'done': "Done", 'cancelled': "Cancelled", 'failed': "Failed"}[status])
+            if not runner.busy():
+                cancel_button.config(state='disabled')
+    root.after(POLL_MS, poll_jobs)
+
+def show_faq():
+    faq_message = """
+Application Functionality
+1. File Processing:
+    • The application will automatically scan the input folder for XML and TXT files.
+    • XML files will be processed according to their format (CODIS or NIEM).
+    • TXT files will be parsed to extract allele data.
+
+2. Data Consolidation:
+    • Extracted data from all files will be consolidated into a single DataFrame.
+    • The data will be stored in sequencing_summary.sqlite in the output folder, and new rows are added to sequencing_summary.csv.
+
+3. Formatting the Data:
+    • The application will pivot the data to consolidate rows into a single line per specimen, with loci as columns.
+    • The processed data will be saved in final_DNA_sequencing_summary.csv in the output folder.
+
+4. Finding Matches:
+    • The application will compare the specimens in new files with all stored specimens and with each other, based on the set sensitivity.
+    • Existing matches will be loaded and new matches will be appended.
+    • The matches will be saved in DNA_matches.csv in the output folder.
+
+Sample Matching Methodology
+1. Loading Existing Matches:
+    • Existing matches from DNA_matches.csv will be loaded and kept; pairs with a specimen that was read again are scored again.
+    • Stored specimen profiles are kept in genotype_index.pkl so older specimens are not compared with each other again.
+
+2. Sensitivity Use:
+    • The sensitivity value determines how stringent the matching criteria are. A higher value (closer to 1) requires more loci to match exactly.
+    • Matches are found by comparing alleles for each locus. If the alleles match exactly, the locus is considered a match. Example: 24/26 alleles are identical matches, then the sensitivity score is 24/26 = 0.92.
+
+3. Finding New Matches:
+    • Specimens are grouped by LocusName, and alleles are compared to identify matches.
+    • Only pairs that include at least one specimen from the new files are considered.
+    • Matches with a score above the sensitivity threshold are saved.
+
+Notes
+1. Duplicate Files:
+    • If two identical copies of one file exist under different names or folders, only the first one is processed; the copy is reported in the log as identical to it.
+    • A file that is changed after it was processed is processed again on the next run.
+
+2. Resetting Result Files:
+    • To reset the result files, you can delete them in the output folder (including sequencing_summary.sqlite and genotype_index.pkl) or select a new output folder for a new analysis of the input folder.
+    • If only sequencing_summary.sqlite is deleted, it is rebuilt from sequencing_summary.csv and DNA_matches.csv on the next run.
+
+3. Running and Cancelling:
+    • Pressing Start Processing while a run is in progress queues the new run; queued runs start one after another.
+    • The bar under the buttons shows the current stage, with the number of files read while reading files.
+    • Cancel stops the current run while its files are being read, before anything is saved. Once the files are read, the run finishes so the result files stay consistent.
+
+Viewing Results
+1. Sequencing Summary:
+    • The consolidated sequencing data is saved in sequencing_summary.csv.
+    • The final processed data is saved in final_DNA_sequencing_summary.csv.
+
+2. DNA Matches:
+    • Matches are saved in DNA_matches.csv.
+    • The results include specimen IDs, match scores, and the latest match time.
+
+3. Settings:
+    • The sensitivity setting is saved in settings.csv.
+    • The list of processed files (by path within the input folder, size, modification time and content) is kept in sequencing_summary.sqlite.
+
+Technical Support
+For further questions or technical support, please contact: eitanfass1996@gmail.com
+"""
+    messagebox.showinfo("Info", faq_message)
+
+
+
+def load_history():
+    paths = {'InputFolderPath': '', 'OutputFolderPath': '', 'Sensitivity': '0.8'}  # Default sensitivity
+    try:
+        with open(HISTORY_FILE_PATH, 'r', encoding='utf-8') as file:
+            for line in file:
+                key, value = line.strip().split('=')
+                paths[key] = value.strip()
+            # print("History loaded:", paths)  # Debug print
+        return paths['InputFolderPath'], paths['OutputFolderPath'], paths['Sensitivity']
+    except FileNotFoundError:
+        print("History file not found.")  # Alert if the file is not found
+        return '', '', '0.8'  # Return defaults
+    except Exception as e:
+        print("Failed to load history:", e)  # Print other exceptions
+        return '', '', '0.8'  # Return defaults
+
+def save_history(input_folder_path, output_folder_path, sensitivity):
+    try:
+        with open(HISTORY_FILE_PATH, 'w', encoding='utf-8') as file:
+            file.write(f"InputFolderPath={input_folder_path}\n")
+            file.write(f"OutputFolderPath={output_folder_path}\n")
+            file.write(f"Sensitivity={sensitivity}\n")  # Add the sensitivity setting
+        # print("History saved:", input_folder_path, output_folder_path, sensitivity)  # Debug print
+    except Exception as e:
+        print("Failed to save history:", e)  # Print any errors encountered
+
+HISTORY_FILE_PATH='history.txt'
+
+
+def main(warm=WARM_UP):
+    """ Open the window and run it until it is closed; with warm, the engine is imported in the
+    background once the window shows (see warm_up). """
+    global root, input_folder_path_entry, output_folder_path_entry, sensitivity_entry, cancel_button, \
+        stage_label, progress_bar, log, runner
+
+    root = tk.Tk()
+    root.title("DNA Sequencing Data Processor")
+
+    # Load the last used directory paths and sensitivity from history file
+    input_folder_path, output_folder_path, last_used_sensitivity = load_history()
+
+    input_folder_path_entry = tk.Entry(root, width=80)
+    input_folder_path_entry.insert(0, input_folder_path)
+    input_folder_path_entry.pack(pady=10)
+
+    input_folder_select_button = tk.Button(root, text="Select Input Folder", command=lambda: choose_folder(input_folder_path_entry, output_folder_path_entry))
+    input_folder_select_button.pack(pady=10)
+
+    output_folder_path_entry = tk.Entry(root, width=80)
+    output_folder_path_entry.insert(0, output_folder_path)
+    output_folder_path_entry.pack(pady=10)
+
+    output_folder_select_button = tk.Button(root, text="Select Output Folder", command=lambda: choose_folder(output_folder_path_entry, input_folder_path_entry))
+    output_folder_select_button.pack(pady=10)
+
+
+    sensitivity_label = tk.Label(root, text="Match Sensitivity (0-1):")
+    sensitivity_label.pack()
+    sensitivity_entry = tk.Entry(root, width=10)
+    sensitivity_entry.insert(0, last_used_sensitivity)  # Set the last used sensitivity
+    sensitivity_entry.pack(pady=5)
+
+    start_button = tk.Button(root, text="Start Processing", command=start_thread)
+    start_button.pack(pady=(20, 5))
+
+    cancel_button = tk.Button(root, text="Cancel", command=cancel_job, state='disabled')
+    cancel_button.pack(pady=5)
+
+    stage_label = tk.Label(root, text="")
+    stage_label.pack()
+    progress_bar = ttk.Progressbar(root, length=400, mode='determinate')
+    progress_bar.pack(pady=5)
+
+    help_button = tk.Button(root, text="Help/Info", command=show_faq)
+    help_button.pack(pady=10)
+
+    log = scrolledtext.ScrolledText(root, state='disabled', width=70, height=10)
+    log.pack(pady=20)
+
+    # Jobs run on a worker thread; their output and progress reach the window through poll_jobs
+    runner = JobRunner()
+    runner.capture_output()
+    root.after(POLL_MS, poll_jobs)
+    if warm:
+        root.after(WARM_UP_MS, warm_up)
+
+    root.mainloop()
@@ -0,0 +1,266 @@
+""" Inverted (locus, genotype) -> specimen index for sub-quadratic candidate search. """
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from dna_engine.genotypes import encode_profiles, merge_profiles, query_keys
+from dna_engine.matching import MATCH_COLUMNS, match_frame, required_matches
+
+INDEX_VERSION = 1
+DEFAULT_PAIR_BUDGET = 1 << 18   # candidate pairs verified per batch
+
+
+def pair_budget(memory_budget_mib, n_loci):
+    """ Candidate pairs per batch that fit a memory budget in MiB (two genotype key rows per pair). """
+    pair_bytes = 2 * 8 * max(n_loci, 1) + 64
+    return max(1024, int(memory_budget_mib * 2 ** 20 // pair_bytes))
+
+
+class GenotypeIndex:
+    """ Posting lists of specimens per (locus, genotype) over a GenotypeMatrix.
+
+    A pair (i, j) can only reach `need` identical loci if j shares a genotype with i on at
+    least one of any (typed loci - need + 1) loci of i (pigeonhole). Each specimen therefore
+    probes only the postings of its rarest loci, and the candidates are then verified
+    exactly on the genotype keys.
+    """
+
+    def __init__(self, profiles, source=None):
+        self.profiles = profiles
+        self.source = source            # fingerprint of the data file the index was built from
+        self.keys = profiles.genotype_keys()
+        self.totals = profiles.locus_counts()
+        self.pairs_compared = 0         # candidate pairs verified by score_pairs, for run metrics
+        self._build_postings()
+
+    @classmethod
+    def build(cls, df, source=None):
+        return cls(encode_profiles(df), source)
+
+    def _build_postings(self):
+        n, n_loci = self.keys.shape if self.keys.size else (len(self.profiles), 0)
+        spec, locus = np.nonzero(self.keys >= 0)            # specimen-major, so postings stay sorted
+        self.key_stride = int(self.keys.max(initial=0)) + 1
+        posting_key = locus * self.key_stride + self.keys[spec, locus]
+        order = np.argsort(posting_key, kind='stable')
+        posting_key = posting_key[order]
+        starts = np.flatnonzero(np.r_[True, posting_key[1:] != posting_key[:-1]]) if len(order) else np.empty(0, dtype=np.int64)
+        self.posting_keys = posting_key[starts]             # sorted (locus, genotype) key of each posting
+        self.posting_specimens = spec[order]
+        self.posting_starts = starts
+        self.posting_sizes = np.diff(np.r_[starts, len(order)])
+        # Posting number of every typed (specimen, locus) cell, -1 where untyped
+        self.cell_posting = np.full((n, n_loci), -1, dtype=np.int64)
+        cell_posting = np.repeat(np.arange(len(starts)), self.posting_sizes)
+        self.cell_posting[spec[order], locus[order]] = cell_posting
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def update(self, profiles, source=None, replaced=None):
+        """ New index with the specimens of profiles added or replaced (see merge_profiles for replaced). """
+        return GenotypeIndex(merge_profiles(self.profiles, profiles, replaced), source)
+
+    def positions(self, specimen_ids):
+        """ Boolean mask of the index rows holding specimen_ids. """
+        return pd.Index(self.profiles.specimen_ids, dtype=object).isin(list(specimen_ids))
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            pickle.dump({'version': INDEX_VERSION, 'source': self.source, 'profiles': self.profiles}, file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            state = pickle.load(file)
+        if state.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {state.get('version')}")
+        return cls(state['profiles'], state['source'])
+
+    def candidate_pairs(self, sensitivity, active=None, pair_budget=DEFAULT_PAIR_BUDGET):
+        """ Yield (i, j) candidate arrays, i < j, covering every pair that can reach sensitivity. """
+        n = len(self)
+        active = np.ones(n, dtype=bool) if active is None else np.asarray(active, dtype=bool)
+        need = required_matches(self.totals, sensitivity)
+
+        # Specimens every later specimen matches: compare against all of them
+        for i in np.flatnonzero(active & (need == 0)):
+            j = np.flatnonzero(active[i + 1:]) + i + 1
+            yield np.full(len(j), i), j
+
+        probing = np.flatnonzero(active & (need > 0) & (need <= self.totals))
+        if not len(probing):
+            return
+        # Per specimen, its typed postings ordered from rarest to most common
+        sizes = np.where(self.cell_posting >= 0, self.posting_sizes[self.cell_posting], np.iinfo(np.int64).max)
+        rarest = np.argsort(sizes, axis=1, kind='stable')
+        prefix = self.totals - need + 1
+
+        batch, batch_pairs = [], 0
+        for i in probing:
+            postings = self.cell_posting[i, rarest[i, :prefix[i]]]
+            batch.append((i, postings))
+            batch_pairs += int(self.posting_sizes[postings].sum())
+            if batch_pairs >= pair_budget:
+                yield self._expand(batch, active)
+                batch, batch_pairs = [], 0
+        if batch:
+            yield self._expand(batch, active)
+
+    def _probe(self, batch):
+        """ Expand (specimen, postings) probes into (specimen, posting member) arrays. """
+        owners = np.concatenate([np.full(len(postings), i) for i, postings in batch])
+        postings = np.concatenate([postings for _, postings in batch])
+        sizes = self.posting_sizes[postings]
+        offsets = np.repeat(self.posting_starts[postings] - np.cumsum(sizes) + sizes, sizes)
+        return np.repeat(owners, sizes), self.posting_specimens[np.arange(sizes.sum()) + offsets]
+
+    def _expand(self, batch, active):
+        """ Turn (specimen, postings) probes into unique (i, j) pairs with j > i. """
+        i, j = self._probe(batch)
+        keep = (j > i) & active[j]
+        pair = np.unique(i[keep].astype(np.int64) * len(self) + j[keep])
+        return pair // len(self), pair % len(self)
+
+    def touched_pairs(self, sensitivity, touched, active=None, pair_budget=DEFAULT_PAIR_BUDGET):
+        """ Yield (i, j) candidate arrays, i < j, covering every pair with a touched specimen that can
+        reach sensitivity.
+
+        A touched specimen t may be either side of the pair, so it probes its postings with the
+        smallest requirement it can face: its own, or the lowest of any other specimen.
+        """
+        n = len(self)
+        active = np.ones(n, dtype=bool) if active is None else np.asarray(active, dtype=bool)
+        touched = np.asarray(touched, dtype=bool) & active
+        need = required_matches(self.totals, sensitivity)
+        reachable = active & (need <= self.totals)
+        lowest = need[reachable].min() if reachable.any() else self.totals.max(initial=0) + 1
+        probe_need = np.minimum(need, lowest)
+
+        batch, batch_pairs = [], 0
+        for t in np.flatnonzero(touched):
+            if probe_need[t] <= 0:
+                # Both touched: only keep the pair once, from the smaller side
+                u = np.flatnonzero(active)
+                u = u[(u != t) & (~touched[u] | (u > t))]
+                yield np.minimum(t, u), np.maximum(t, u)
+                continue
+            prefix = self.totals[t] - probe_need[t] + 1
+            if prefix <= 0:
+                continue
+            typed = self.cell_posting[t][self.cell_posting[t] >= 0]
+            postings = typed[np.argsort(self.posting_sizes[typed], kind='stable')[:prefix]]
+            batch.append((t, postings))
+            batch_pairs += int(self.posting_sizes[postings].sum())
+            if batch_pairs >= pair_budget:
+                yield self._expand_touched(batch, active, touched)
+                batch, batch_pairs = [], 0
+        if batch:
+            yield self._expand_touched(batch, active, touched)
+
+    def _expand_touched(self, batch, active, touched):
+        """ Turn (touched specimen, postings) probes into unique (i, j) pairs in either orientation. """
+        t, u = self._probe(batch)
+        keep = (u != t) & active[u] & (~touched[u] | (u > t))
+        i, j = np.minimum(t[keep], u[keep]), np.maximum(t[keep], u[keep])
+        pair = np.unique(i.astype(np.int64) * len(self) + j)
+        return pair // len(self), pair % len(self)
+
+    def score_pairs(self, sensitivity, active=None, touched=None, pair_budget=DEFAULT_PAIR_BUDGET):
+        """ Yield (i, j, score) arrays for candidate pairs that reach sensitivity.
+
+        With touched, only pairs involving at least one touched specimen are scored. pair_budget
+        bounds the candidate pairs verified per batch.
+        """
+        need = required_matches(self.totals, sensitivity)
+        if touched is None:
+            candidates = self.candidate_pairs(sensitivity, active, pair_budget)
+        else:
+            candidates = self.touched_pairs(sensitivity, touched, active, pair_budget)
+        for i, j in candidates:
+            self.pairs_compared += len(i)
+            counts = ((self.keys[i] == self.keys[j]) & (self.keys[i] >= 0)).sum(axis=1)
+            hit = counts >= need[i]
+            if hit.any():
+                i, j, counts = i[hit], j[hit], counts[hit]
+                yield i, j, np.where(self.totals[i] > 0, counts / np.maximum(self.totals[i], 1), 0)
+
+    def find_matches(self, sensitivity, exclude_ids=(), new_ids=None):
+        """ Match DataFrame for all pairs reaching sensitivity, skipping exclude_ids.
+
+        With new_ids, only pairs involving at least one of those specimens are returned.
+        """
+        active = ~self.positions(exclude_ids)
+        touched = None if new_ids is None else self.positions(new_ids)
+        scored = list(self.score_pairs(sensitivity, active, touched))
+        if not scored:
+            return pd.DataFrame(columns=MATCH_COLUMNS)
+        i, j, score = (np.concatenate(parts) for parts in zip(*scored))
+        order = np.lexsort((j, i))      # same pair order as the exhaustive scan
+        return match_frame(self.profiles, i[order], j[order], score[order])
+
+    def search(self, profile, k=10, specimen_id=None, min_score=0.0):
+        """ The k stored specimens most similar to one profile {locus: [alleles]}, best first.
+
+        Scores follow find_matches: identical loci / typed loci of the specimen whose SpecimenID
+        sorts first. Without specimen_id the query counts as the first, so its own typed loci
+        are the denominator; with specimen_id, that specimen itself is left out. Only specimens
+        sharing at least one genotype are scored, by counting over the postings of the query's
+        genotypes. Ties are broken by SpecimenID.
+        """
+        query, typed = query_keys(self.profiles, profile)
+        loci = np.flatnonzero(query >= 0)
+        wanted = loci * self.key_stride + query[loci]
+        found = np.searchsorted(self.posting_keys, wanted)
+        found = found[(found < len(self.posting_keys)) & (self.posting_keys[np.minimum(found, len(self.posting_keys) - 1)] == wanted)]
+        sizes = self.posting_sizes[found]
+        offsets = np.repeat(self.posting_starts[found] - np.cumsum(sizes) + sizes, sizes)
+        counts = np.bincount(self.posting_specimens[np.arange(sizes.sum()) + offsets], minlength=len(self))
+
+        ids = np.asarray(self.profiles.specimen_ids, dtype=object)
+        candidates = np.flatnonzero(counts > 0)
+        denominators = np.full(len(candidates), typed)
+        if specimen_id is not None:
+            candidates = candidates[ids[candidates] != specimen_id]
+            stored_first = ids[candidates] < specimen_id
+            denominators = np.where(stored_first, self.totals[candidates], typed)
+        scores = np.where(denominators > 0, counts[candidates] / np.maximum(denominators, 1), 0)
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        best = np.lexsort((candidates, -scores))[:k]     # candidates are in SpecimenID order
+        candidates, scores = candidates[best], scores[best]
+
+        result = self.profiles.meta.iloc[candidates].reset_index(drop=True)
+        result.insert(0, 'SpecimenID', ids[candidates])
+        result.insert(1, 'MatchScore', scores)
+        result.insert(2, 'IdenticalLoci', counts[candidates])
+        return result
+
+    def iter_matches(self, sensitivity, exclude_ids=(), new_ids=None, pair_budget=DEFAULT_PAIR_BUDGET):
+        """ Yield the matches of find_matches as one DataFrame per scored batch, without collecting them.
+
+        Each batch holds at most pair_budget candidate pairs, so memory does not grow with the
+        number of matches. Pairs are sorted within a batch, not across batches.
+        """
+        active = ~self.positions(exclude_ids)
+        touched = None if new_ids is None else self.positions(new_ids)
+        for i, j, score in self.score_pairs(sensitivity, active, touched, pair_budget):
+            order = np.lexsort((j, i))
+            yield match_frame(self.profiles, i[order], j[order], score[order])
+
+
+def load_or_build_index(index_path, source, load_rows):
+    """ Load the index saved at index_path, rebuilding it with load_rows() if it is not from source. """
+    if os.path.exists(index_path):
+        try:
+            index = GenotypeIndex.load(index_path)
+            if index.source == source:
+                return index
+        except Exception as e:
+            print(f"Rebuilding genotype index ({e})")
+    index = GenotypeIndex.build(load_rows(), source)
+    index.save(index_path)
+    return index
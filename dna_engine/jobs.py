@@ -0,0 +1,141 @@
+""" Background job runner: jobs run one after another on a worker thread, reporting through a queue.
+
+The worker never touches the user interface. Printed output, progress and job status are put on
+the events queue, and the interface drains it from its own thread (with Tk, from root.after), so
+a burst of log lines costs one widget update instead of one per print.
+"""
+import queue
+import sys
+import threading
+import traceback
+
+
+class Cancelled(Exception):
+    """ Raised at a checkpoint of a job whose cancellation was requested. """
+
+
+class JobControl:
+    """ Progress reports and cooperative cancellation for one running job.
+
+    The job calls progress(stage, done, total) as it goes and check() where it is safe to stop;
+    check() raises Cancelled once cancel() was called.
+    """
+
+    def __init__(self, report=None):
+        self.report = report
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+    def progress(self, stage, done=0, total=0):
+        if self.report:
+            self.report(stage, done, total)
+
+
+class NullControl:
+    """ JobControl for runs outside a job runner: no reports, never cancelled. """
+
+    def check(self):
+        pass
+
+    def progress(self, stage, done=0, total=0):
+        pass
+
+
+NO_CONTROL = NullControl()
+
+
+class QueueWriter:
+    """ File-like object putting written text on a queue, to stand in for sys.stdout. """
+
+    def __init__(self, events):
+        self.events = events
+
+    def write(self, text):
+        if text:
+            self.events.put(('log', text))
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class JobRunner:
+    """ Runs submitted jobs one at a time on a worker thread.
+
+    A job is a function taking a JobControl. Events put on self.events are ('log', text),
+    ('progress', stage, done, total), ('start', name, queued), and ('end', name, status)
+    with status 'done', 'cancelled' or 'failed'. drain() collects them for the interface.
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.jobs = queue.Queue()
+        self.current = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, name, job):
+        """ Queue a job; returns the number of jobs waiting before it. """
+        with self.lock:
+            waiting = self.jobs.qsize() + (self.current is not None)
+            self.jobs.put((name, job))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._work, daemon=True)
+                self.thread.start()
+        return waiting
+
+    def cancel(self):
+        """ Ask the running job to stop at its next checkpoint. """
+        with self.lock:
+            if self.current is not None:
+                self.current.cancel()
+
+    def busy(self):
+        return self.current is not None or not self.jobs.empty()
+
+    def _work(self):
+        while True:
+            with self.lock:
+                try:
+                    name, job = self.jobs.get_nowait()
+                except queue.Empty:
+                    self.thread = None
+                    return
+                self.current = JobControl(lambda stage, done, total: self.events.put(('progress', stage, done, total)))
+                control = self.current
+            self.events.put(('start', name, self.jobs.qsize()))
+            try:
+                job(control)
+                status = 'done'
+            except Cancelled:
+                status = 'cancelled'
+            except Exception:
+                self.events.put(('log', traceback.format_exc()))
+                status = 'failed'
+            with self.lock:
+                self.current = None
+            self.events.put(('end', name, status))
+
+    def drain(self, limit=1000):
+        """ Up to limit pending events, with consecutive log texts joined into one. """
+        events = []
+        for _ in range(limit):
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'log' and events and events[-1][0] == 'log':
+                events[-1] = ('log', events[-1][1] + event[1])
+            else:
+                events.append(event)
+        return events
+
+    def capture_output(self):
+        """ Send everything printed (from any thread) to the events queue. """
+        sys.stdout = QueueWriter(self.events)
@@ -0,0 +1,107 @@
+""" Manifest of ingested input files, keyed on their path relative to the input folder. """
+import hashlib
+import os
+
+MANIFEST_COLUMNS = ['Path', 'Size', 'MTime', 'Hash', 'DuplicateOf']
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def relative_key(folder_path, file_path):
+    """ Manifest key of a file: its path relative to the input folder, with '/' separators. """
+    return os.path.relpath(file_path, folder_path).replace(os.sep, '/')
+
+
+def file_digest(file_path):
+    """ SHA-1 of the file content. """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ScanManifest:
+    """ Ingested files as (Path, Size, MTime, Hash, DuplicateOf) entries with dict lookups.
+
+    A file whose size and mtime match its entry is skipped without being opened. Otherwise it is
+    hashed (when hash_files is on): a file with the bytes of another ingested file is recorded as
+    a duplicate of it instead of being parsed again; so is a parsed file whose rows all turn out to
+    be another file's (see record_copies). A file recorded with other content than it had when last
+    ingested is listed in replaced, as its stored rows are out of date, and its copies then have to
+    be read in its place (see stale_copies). legacy_names are base names from the old
+    ScannedFiles list in settings.csv; matching files are taken over as already scanned.
+    folders maps folder keys to their modification time at the last complete scan (see
+    dna_engine.discovery.FolderWalk).
+    """
+
+    def __init__(self, rows=(), hash_files=True, legacy_names=(), folders=()):
+        self.entries = {row[0]: tuple(row) for row in rows}
+        self.hashes = {row[3]: row[0] for row in self.entries.values() if row[3] and not row[4]}
+        self.hash_files = hash_files
+        self.legacy_names = set(legacy_names)
+        self.folders = dict(folders)
+        self.updates = []   # entries recorded since loading, to be saved
+        self.replaced = []  # keys of ingested files recorded with new content since loading
+
+    def __len__(self):
+        return len(self.entries)
+
+    def classify(self, folder_path, file_path, stat=None):
+        """ Return (status, entry) for a file: 'unchanged', 'new', 'changed' or 'duplicate'.
+
+        'new' and 'changed' files should be parsed and then passed to record(); 'unchanged' and
+        'duplicate' ones are already recorded. stat is the os.stat() of the file if already known.
+        """
+        key = relative_key(folder_path, file_path)
+        stat = stat or os.stat(file_path)
+        known = self.entries.get(key)
+        if known and known[1] == stat.st_size and known[2] == stat.st_mtime_ns:
+            return 'unchanged', known
+
+        digest = file_digest(file_path) if self.hash_files else None
+        entry = (key, stat.st_size, stat.st_mtime_ns, digest, None)
+        if known is None and os.path.basename(file_path) in self.legacy_names:
+            self.record(entry)   # scanned by a version that kept only file names
+            return 'unchanged', entry
+        if known and digest and known[3] == digest:   # touched, same bytes
+            self.record(entry[:4] + known[4:])
+            return 'unchanged', entry
+        if known and self.hashes.get(known[3]) == key:
+            del self.hashes[known[3]]   # its old content is no longer stored
+        original = self.hashes.get(digest) if digest else None
+        if original and original != key:
+            entry = entry[:4] + (original,)
+            self.record(entry)
+            return 'duplicate', entry
+        if digest:
+            self.hashes[digest] = key   # later copies in this scan are duplicates of this file
+        return ('changed' if known else 'new'), entry
+
+    def record(self, entry):
+        """ Mark a file as ingested. """
+        known = self.entries.get(entry[0])
+        if known and not (entry[3] and entry[3] == known[3]):
+            self.replaced.append(entry[0])
+        self.entries[entry[0]] = entry
+        if entry[3] and not entry[4]:
+            self.hashes.setdefault(entry[3], entry[0])
+        self.updates.append(entry)
+
+    def record_copies(self, copies):
+        """ Record ingested files as copies of other files ({file key: key of the file it copies}),
+        for files found to have the rows of another one without having its bytes. """
+        for key, original in copies.items():
+            entry = self.entries.get(key)
+            if entry is None or entry[4] == original:
+                continue
+            if self.hashes.get(entry[3]) == key:
+                del self.hashes[entry[3]]   # its rows are not stored, so byte copies of it have to be read
+            self.entries[key] = entry[:4] + (original,)
+            self.updates.append(self.entries[key])
+
+    def stale_copies(self):
+        """ Entries of the files recorded as copies of a replaced file's previous content. """
+        replaced = set(self.replaced)
+        if not replaced:
+            return []
+        return [entry for entry in self.entries.values() if entry[4] in replaced and entry[3] != self.entries[entry[4]][3]]
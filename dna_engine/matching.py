@@ -0,0 +1,161 @@
+""" Batched NumPy scoring of specimen pairs on a GenotypeMatrix. """
+import numpy as np
+import pandas as pd
+
+from dna_engine.genotypes import popcount
+
+MATCH_COLUMNS = ['SpecimenID1', 'SpecimenID2', 'MatchScore', 'LatestMatchTime',
+                 'CaseID1', 'CaseID2', 'SpecimenComment1', 'SpecimenComment2', 'ReadingBy1', 'ReadingBy2']
+
+DEFAULT_BLOCK_CELLS = 1 << 24   # pair cells scored per batch, bounds the temporary arrays
+
+
+def required_matches(totals, sensitivity):
+    """ Smallest identical-locus count k with k / total >= sensitivity, per specimen.
+
+    Specimens that can never reach the threshold get total + 1. The float comparison is the
+    same one find_matches makes, so counts >= required is exactly score >= sensitivity.
+    """
+    totals = np.asarray(totals, dtype=np.int64)
+    safe = np.maximum(totals, 1)
+    need = np.clip(np.ceil(sensitivity * totals), 0, totals + 1).astype(np.int64)
+    lower = np.maximum(need - 1, 0)
+    need = np.where((need > 0) & (lower / safe >= sensitivity), lower, need)
+    need = np.where((need <= totals) & (need / safe < sensitivity), need + 1, need)
+    # A specimen without loci scores 0 against everything
+    return np.where(totals == 0, np.where(0 >= sensitivity, 0, 1), need)
+
+
+def block_rows(n_rows, n_cols, block_cells=DEFAULT_BLOCK_CELLS):
+    """ Number of query rows to score per batch against n_cols candidates. """
+    return max(1, min(n_rows, block_cells // max(n_cols, 1)))
+
+
+def identical_counts(row_keys_t, col_keys_t):
+    """ Identical-locus counts for every (row, col) pair, from loci x specimens genotype keys. """
+    counts = np.zeros((row_keys_t.shape[1], col_keys_t.shape[1]), dtype=np.int16)
+    for row_keys, col_keys in zip(row_keys_t, col_keys_t):
+        row_keys = row_keys[:, None]
+        counts += (row_keys == col_keys[None, :]) & (row_keys >= 0)
+    return counts
+
+
+def shared_allele_counts(row_words_t, col_words_t):
+    """ Shared-allele counts for every (row, col) pair, from words x specimens allele bitsets. """
+    counts = np.zeros((row_words_t.shape[1], col_words_t.shape[1]), dtype=np.int16)
+    for row_words, col_words in zip(row_words_t, col_words_t):
+        counts += popcount(row_words[:, None] & col_words[None, :])
+    return counts
+
+
+def score_pairs(gm, sensitivity, block_size=None):
+    """ Yield (i, j, score) arrays for pairs i < j whose MatchScore reaches sensitivity.
+
+    The score is identical loci / typed loci of specimen i, as in find_matches, and pairs
+    come out ordered by i and then j.
+    """
+    n = len(gm)
+    if n < 2:
+        return
+    keys_t = np.ascontiguousarray(gm.genotype_keys().T)
+    totals = gm.locus_counts()
+    need = required_matches(totals, sensitivity)
+    rows_per_block = block_size or block_rows(n, n)
+
+    for start in range(0, n - 1, rows_per_block):
+        rows = np.arange(start, min(start + rows_per_block, n - 1))
+        cols = np.arange(start + 1, n)
+        counts = identical_counts(keys_t[:, rows], keys_t[:, cols])
+        hit = counts >= need[rows][:, None]
+        hit &= cols[None, :] > rows[:, None]
+        hit_rows, hit_cols = np.nonzero(hit)
+        if len(hit_rows):
+            i, j = rows[hit_rows], cols[hit_cols]
+            score = np.where(totals[i] > 0, counts[hit_rows, hit_cols] / np.maximum(totals[i], 1), 0)
+            yield i, j, score
+
+
+def score_shared_pairs(bits, sensitivity, touched=None, block_size=None):
+    """ Yield (i, j, score) arrays for pairs i < j whose allele-sharing score reaches sensitivity.
+
+    The score is shared alleles / alleles of specimen i (see genotypes.AlleleBits), so identical
+    profiles score 1 as with the exact score, and partial profiles get credit for every allele
+    they share. Blocks of pairs are counted with AND and popcount on the packed words. Pairs come
+    out ordered by i and then j; with touched (a boolean mask), only pairs with a touched
+    specimen are scored, ordered by block.
+    """
+    n = len(bits)
+    if n < 2:
+        return
+    words_t = np.ascontiguousarray(bits.words.T)
+    totals = bits.counts
+    need = required_matches(totals, sensitivity)
+    if touched is None:
+        rows_to_score, cols = np.arange(n - 1), None
+    else:
+        touched = np.asarray(touched, dtype=bool)
+        rows_to_score, cols = np.flatnonzero(touched), np.arange(n)
+    rows_per_block = block_size or block_rows(len(rows_to_score), n)
+
+    for start in range(0, len(rows_to_score), rows_per_block):
+        rows = rows_to_score[start:start + rows_per_block]
+        if touched is None:
+            cols = np.arange(rows[0] + 1, n)
+            first = np.broadcast_to(rows[:, None], (len(rows), len(cols)))
+            keep = cols[None, :] > rows[:, None]
+        else:
+            # A touched specimen may be either side; keep a pair of two touched ones once
+            first = np.minimum(rows[:, None], cols[None, :])
+            keep = (cols[None, :] != rows[:, None]) & (~touched[cols][None, :] | (cols[None, :] > rows[:, None]))
+        counts = shared_allele_counts(words_t[:, rows], words_t[:, cols])
+        hit_rows, hit_cols = np.nonzero(keep & (counts >= need[first]))
+        if len(hit_rows):
+            i = first[hit_rows, hit_cols]
+            j = np.maximum(rows[hit_rows], cols[hit_cols])
+            score = np.where(totals[i] > 0, counts[hit_rows, hit_cols] / np.maximum(totals[i], 1), 0)
+            yield i, j, score
+
+
+def match_frame(gm, i, j, score):
+    """ Build match rows in the DNA_matches.csv layout for the given pair indices. """
+    ids = np.asarray(gm.specimen_ids, dtype=object)
+    meta = {column: gm.meta[column].to_numpy(dtype=object) for column in gm.meta.columns}
+    times_i, times_j = meta['ReadingDateTime'][i], meta['ReadingDateTime'][j]
+    return pd.DataFrame({
+        'SpecimenID1': ids[i],
+        'SpecimenID2': ids[j],
+        'MatchScore': score,
+        'LatestMatchTime': [max(a, b) for a, b in zip(times_i, times_j)],
+        'CaseID1': meta['CaseID'][i],
+        'CaseID2': meta['CaseID'][j],
+        'SpecimenComment1': meta['SpecimenComment'][i],
+        'SpecimenComment2': meta['SpecimenComment'][j],
+        'ReadingBy1': meta['ReadingBy'][i],
+        'ReadingBy2': meta['ReadingBy'][j],
+    }, columns=MATCH_COLUMNS)
+
+
+def find_exact_matches(gm, sensitivity, block_size=None):
+    """ All pairs of gm reaching sensitivity, as a match DataFrame. """
+    frames = [match_frame(gm, i, j, score) for i, j, score in score_pairs(gm, sensitivity, block_size)]
+    if not frames:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_shared_matches(gm, bits, sensitivity, touched=None, block_size=None):
+    """ Yield the allele-sharing matches of gm (with bits from encode_allele_bits on the same rows)
+    as one match DataFrame per scored block, without collecting them. """
+    for i, j, score in score_shared_pairs(bits, sensitivity, touched, block_size):
+        yield match_frame(gm, i, j, score)
+
+
+def find_shared_matches(gm, bits, sensitivity, touched=None, block_size=None):
+    """ All pairs of gm whose allele-sharing score reaches sensitivity, as a match DataFrame
+    ordered by pair, like find_exact_matches. """
+    scored = list(score_shared_pairs(bits, sensitivity, touched, block_size))
+    if not scored:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+    i, j, score = (np.concatenate(parts) for parts in zip(*scored))
+    order = np.lexsort((j, i))
+    return match_frame(gm, i[order], j[order], score[order])
@@ -0,0 +1,134 @@
+""" Per-stage timers, counters and peak memory of a pipeline run, written as JSON. """
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+RATE_COUNTERS = ('files', 'bytes', 'rows', 'specimens', 'pairs_compared')   # reported per second too
+
+
+def peak_rss_mib():
+    """ Peak resident set size of this process so far in MiB, or None if it can't be read. """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10   # bytes on macOS, KiB elsewhere
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize / 2 ** 20
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+class Stage:
+    """ Context manager adding the time spent in it to one stage of a Metrics. """
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stage = self.metrics.stage_entry(self.name)
+        stage['seconds'] += time.perf_counter() - self.start
+        stage['calls'] += 1
+        stage['peak_rss_mib'] = peak_rss_mib()
+
+
+class Metrics:
+    """ Timers and counters per pipeline stage (ingest, dedup, matching, pivot, write).
+
+    Wrap a stage in `with metrics.stage('ingest'):` and add counts with
+    metrics.count('ingest', 'files'). The peak RSS of the process is taken at the end of each stage.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.values = {}
+
+    def stage_entry(self, name):
+        return self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_rss_mib': None, 'counters': {}})
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def count(self, stage, name, value=1):
+        counters = self.stage_entry(stage)['counters']
+        counters[name] = counters.get(name, 0) + value
+
+    def set(self, name, value):
+        """ Record a run-level value (settings, totals). """
+        self.values[name] = value
+
+    def as_dict(self):
+        stages = {}
+        for name, stage in self.stages.items():
+            entry = dict(stage, seconds=round(stage['seconds'], 4))
+            # Throughput of timed stages, e.g. files_per_second for ingest
+            for counter, value in stage['counters'].items():
+                if counter in RATE_COUNTERS and stage['seconds'] > 0:
+                    entry.setdefault('rates', {})[f'{counter}_per_second'] = round(value / stage['seconds'], 1)
+            stages[name] = entry
+        return {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'seconds': round(time.time() - self.started, 4), 'peak_rss_mib': peak_rss_mib(),
+                'stages': stages, **self.values}
+
+    def write(self, path):
+        """ Write the metrics as JSON to path (replacing the previous run's file). """
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(self.as_dict(), file, indent=1)
+        os.replace(path + '.tmp', path)
+
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullMetrics:
+    """ Metrics that record nothing, for runs with instrumentation turned off. """
+
+    enabled = False
+    _stage = NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, stage, name, value=1):
+        pass
+
+    def set(self, name, value):
+        pass
+
+    def write(self, path):
+        pass
+
+
+NO_METRICS = NullMetrics()
@@ -0,0 +1,87 @@
+""" All-pairs scoring of a GenotypeMatrix split into tiles and spread over a process pool. """
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from dna_engine.matching import MATCH_COLUMNS, identical_counts, match_frame, required_matches, shared_allele_counts
+
+DEFAULT_TILE_SIZE = 2048   # specimens per tile side; a tile's int16 counts take 8 MiB
+
+_worker = {}   # genotype keys (or allele words) and thresholds attached by each worker process
+
+
+def tiles(n, tile_size=DEFAULT_TILE_SIZE):
+    """ (row start, row stop, col start, col stop) tiles covering every pair i < j, row-major. """
+    starts = range(0, n, tile_size)
+    return [(r, min(r + tile_size, n), c, min(c + tile_size, n)) for r in starts for c in starts if c + tile_size > r + 1]
+
+
+def _attach(name, shape, dtype, need, totals, shared=False):
+    """ Pool initializer: map the shared genotype keys instead of receiving a copy. """
+    block = shared_memory.SharedMemory(name=name)
+    _worker.update(block=block, keys_t=np.ndarray(shape, dtype=dtype, buffer=block.buf), need=need, totals=totals,
+                   counts=shared_allele_counts if shared else identical_counts)
+
+
+def _score_tile(tile):
+    """ (i, j, score) arrays of the pairs i < j in a tile that reach their threshold. """
+    r0, r1, c0, c1 = tile
+    keys_t, need, totals = _worker['keys_t'], _worker['need'], _worker['totals']
+    counts = _worker['counts'](keys_t[:, r0:r1], keys_t[:, c0:c1])
+    rows, cols = np.arange(r0, r1), np.arange(c0, c1)
+    hit = counts >= need[r0:r1, None]
+    hit &= cols[None, :] > rows[:, None]
+    hit_rows, hit_cols = np.nonzero(hit)
+    i, j = rows[hit_rows], cols[hit_cols]
+    score = np.where(totals[i] > 0, counts[hit_rows, hit_cols] / np.maximum(totals[i], 1), 0)
+    return i, j, score
+
+
+def score_pairs_parallel(gm, sensitivity, workers, tile_size=DEFAULT_TILE_SIZE, bits=None):
+    """ (i, j, score) arrays for all pairs i < j reaching sensitivity, ordered by i and then j.
+
+    The loci x specimens genotype keys are copied once into shared memory, which every worker
+    maps read-only. Tiles are handed out in row-major order and their results collected in that
+    order, then sorted, so the output does not depend on the number of workers. With bits (see
+    genotypes.encode_allele_bits), the allele words are shared instead and pairs get the
+    allele-sharing score of matching.score_shared_pairs.
+    """
+    n = len(gm)
+    empty = np.empty(0, dtype=np.int64)
+    if n < 2:
+        return empty, empty, np.empty(0)
+    if bits is not None:
+        keys, dtype, totals = bits.words, np.uint64, bits.counts
+    else:
+        keys = gm.genotype_keys()
+        dtype = np.int32 if keys.max(initial=0) < np.iinfo(np.int32).max else np.int64
+        totals = gm.locus_counts()
+    need = required_matches(totals, sensitivity)
+
+    block = shared_memory.SharedMemory(create=True, size=max(keys.size * np.dtype(dtype).itemsize, 1))
+    keys_t = np.ndarray(keys.T.shape, dtype=dtype, buffer=block.buf)
+    try:
+        keys_t[:] = keys.T
+        work = tiles(n, tile_size)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(block.name, keys_t.shape, dtype, need, totals, bits is not None)) as pool:
+            results = list(pool.map(_score_tile, work, chunksize=max(1, len(work) // (workers * 8))))
+    finally:
+        del keys_t   # the block can only be closed once no array uses its buffer
+        block.close()
+        block.unlink()
+
+    i, j, score = (np.concatenate(parts) for parts in zip(*results))
+    order = np.lexsort((j, i))
+    return i[order], j[order], score[order]
+
+
+def find_matches_parallel(gm, sensitivity, workers, tile_size=DEFAULT_TILE_SIZE, bits=None):
+    """ Matches of either score, scored in workers processes: the same as matching.find_exact_matches,
+    or with the AlleleBits of the profiles as bits, as matching.find_shared_matches. """
+    i, j, score = score_pairs_parallel(gm, sensitivity, workers, tile_size, bits)
+    if not len(i):
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+    return match_frame(gm, i, j, score)
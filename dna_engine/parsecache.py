@@ -0,0 +1,105 @@
+""" Local cache of parsed input files, keyed by content hash and parser version, with LRU eviction. """
+import os
+import pickle
+
+import pandas as pd
+
+from dna_engine.categorical import compact_rows, map_categories
+
+DEFAULT_CACHE_MIB = 2048
+DEFAULT_CACHE_FOLDER = os.environ.get('DNA_PARSE_CACHE',
+                                      os.path.join(os.path.expanduser('~'), '.cache', 'dna_lab', 'parsed'))
+
+
+def relabel(frame, old, new):
+    """ Replace the file label old (see get_folder_file_name) by new in every column of frame. """
+    if old == new:
+        return frame
+    frame = frame.copy()
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            if old in values.cat.categories:
+                frame[column] = map_categories(values, lambda names: names.replace(old, new))
+        elif (values == old).any():
+            frame[column] = values.mask(values == old, new)
+    return frame
+
+
+class ParseCache:
+    """ Parsed long-format rows of input files, stored as pickled dictionary-encoded DataFrames.
+
+    Entries are named after the SHA-1 of the file content and the parser version, so the same
+    file is only parsed once whatever folder or output folder it is processed from, and a new
+    parser version never reads old entries. Parsers write the file's folder and name into the
+    rows; the cached label is swapped for the current one on reads. The modification time of an
+    entry is its last use: when the cache grows past max_bytes the least recently used entries
+    are deleted.
+    """
+
+    def __init__(self, folder=DEFAULT_CACHE_FOLDER, max_bytes=DEFAULT_CACHE_MIB * 2 ** 20, version=1):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+        self.entries = {}   # file name: (last use, size)
+        for entry in os.scandir(folder):
+            if entry.name.endswith('.pkl') and entry.is_file():
+                stat = entry.stat()
+                self.entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        self.size = sum(size for _, size in self.entries.values())
+
+    def entry_name(self, digest):
+        return f'{digest}-v{self.version}.pkl'
+
+    def get(self, digest, label):
+        """ Cached rows of the file with this content, labelled for its current location, or None. """
+        name = self.entry_name(digest)
+        if name not in self.entries:
+            self.misses += 1
+            return None
+        path = os.path.join(self.folder, name)
+        try:
+            with open(path, 'rb') as file:
+                cached_label, frame = pickle.load(file)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            self._remove(name)   # evicted by another process or unreadable
+            self.misses += 1
+            return None
+        self.entries[name] = (os.stat(path).st_mtime_ns, self.entries[name][1])
+        self.hits += 1
+        return relabel(frame, cached_label, label)
+
+    def put(self, digest, label, frame):
+        """ Store the parsed rows of a file, then evict entries beyond max_bytes. """
+        name = self.entry_name(digest)
+        path = os.path.join(self.folder, name)
+        try:
+            with open(path + '.tmp', 'wb') as file:
+                pickle.dump((label, compact_rows(frame)), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.tmp', path)
+            stat = os.stat(path)
+        except OSError as e:
+            print(f"Could not cache the parsed rows of {label}: {e}")
+            return
+        self.size += stat.st_size - self.entries.get(name, (0, 0))[1]
+        self.entries[name] = (stat.st_mtime_ns, stat.st_size)
+        self.evict()
+
+    def evict(self):
+        """ Delete the least recently used entries until the cache fits in max_bytes. """
+        if self.size <= self.max_bytes:
+            return
+        for name in sorted(self.entries, key=lambda name: self.entries[name][0]):
+            if self.size <= self.max_bytes:
+                break
+            self._remove(name)
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.folder, name))
+        except OSError:
+            pass
+        self.size -= self.entries.pop(name, (0, 0))[1]
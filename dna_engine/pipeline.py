@@ -0,0 +1,1145 @@
+""" The processing engine: parsing of input files, the Pipeline that stores, summarizes and matches them,
+profile searches and folder watching.
+
+The user interface (dna_engine.gui) and the command line (dna_engine.cli) only import this module
+once a run starts, so pandas and NumPy are not loaded before the window shows.
+"""
+import pandas as pd
+import os
+import sys
+import xml.etree.ElementTree as ET
+import numpy as np 
+import time
+import traceback
+import cProfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dna_engine.categorical import compact_rows, concat_rows
+from dna_engine.discovery import FolderWalk
+from dna_engine.genotypes import encode_allele_bits, encode_profiles, profiles_from_rows
+from dna_engine.matching import find_exact_matches, find_shared_matches, iter_shared_matches
+from dna_engine.index import GenotypeIndex, load_or_build_index, pair_budget
+from dna_engine.jobs import NO_CONTROL
+from dna_engine.manifest import ScanManifest, file_digest
+from dna_engine.metrics import Metrics, NO_METRICS
+from dna_engine.parallel import find_matches_parallel
+from dna_engine.parsecache import DEFAULT_CACHE_MIB, ParseCache
+from dna_engine.spill import MatchSpill, budget_rows
+from dna_engine.store import DATA_COLUMNS, MATCH_FILE_COLUMNS, DataStore, has_header
+from dna_engine.summary import clean_locus_names, order_rows, pivot_alleles, update_summary
+
+
+
+def get_file_paths(folder_path, diffrent_folder=False):
+    if not diffrent_folder:
+        out_folder_path = os.path.dirname(folder_path)
+    else:
+        out_folder_path = folder_path
+    data_file_path = os.path.join(out_folder_path,'sequencing_summary.csv')
+    matches_file_path = os.path.join(out_folder_path, 'DNA_matches.csv')
+    settings_file_path = os.path.join(out_folder_path, 'settings.csv')
+    return data_file_path,matches_file_path,settings_file_path
+
+
+def ensure_files_exist(folder_path, diffrent_folder=False):
+    """ Ensure all necessary files exist, create them if they don't. """
+    data_file_path,matches_file_path,settings_file_path=get_file_paths(folder_path,diffrent_folder=diffrent_folder)
+    
+    if not os.path.exists(data_file_path):
+        print(f"Creating empty data file at {data_file_path}")
+        pd.DataFrame(columns=DATA_COLUMNS).to_csv(data_file_path, index=False)
+    
+    if not os.path.exists(matches_file_path):
+        print(f"Creating empty matches file at {matches_file_path}")
+        pd.DataFrame(columns=MATCH_FILE_COLUMNS).to_csv(matches_file_path, index=False)
+    
+    if not os.path.exists(settings_file_path):
+        print(f"Creating default settings file at {settings_file_path}")
+        pd.DataFrame({'Sensitivity': [0.8], 'ScannedFiles': [""]}).to_csv(settings_file_path, index=False)
+
+def load_data(file_path):
+    """ Load the consolidated data from a CSV file. """
+    # Read everything as text so stored IDs and alleles compare equal to freshly parsed ones
+    return compact_rows(pd.read_csv(file_path, dtype=str))
+
+def load_existing_matches(matches_file_path):
+    """ Load existing matches from a CSV file, return set of unique SpecimenIDs and DataFrame of matches. """
+    matches_df = pd.read_csv(matches_file_path)
+    existing_ids = set(matches_df['SpecimenID1']).union(set(matches_df['SpecimenID2']))
+    return existing_ids, matches_df
+
+def load_settings(settings_file_path):
+    """ Load settings from a CSV file.
+
+    ScannedFiles is only read to take over the scan list of older versions; scanned files are now
+    tracked in the scan manifest of the data store.
+    """
+    settings_df = pd.read_csv(settings_file_path)
+    sensitivity = settings_df['Sensitivity'].iloc[0]
+    scanned_files = np.unique(settings_df['ScannedFiles'].dropna().tolist())
+    return sensitivity, [i for i in scanned_files], settings_df
+
+def save_settings(settings_df, settings_file_path):
+    """ Save settings to a CSV file. """
+    settings_df.to_csv(settings_file_path, index=False)
+MATCH_DATA_COLUMNS = ['SpecimenID', 'LocusName', 'AlleleValue', 'CaseID', 'SpecimenComment', 'ReadingBy', 'ReadingDateTime']
+
+SCORES = ['exact', 'shared']
+
+def find_matches(df, sensitivity, existing_ids, engine='numpy', index=None, new_ids=None, workers=1, score='exact'):
+    """ Find matches between specimens based on a sensitivity threshold, excluding already matched SpecimenIDs.
+
+    engine='numpy' scores all pairs in batches on an integer genotype matrix; engine='parallel'
+    does the same in tiles spread over workers processes; engine='index' only scores candidates
+    from an inverted (locus, genotype) index (pass a prebuilt GenotypeIndex of df as index to
+    reuse it); engine='loop' is the original pairwise loop, kept as the reference.
+    With engine='index' and new_ids, only pairs involving at least one of new_ids are scored.
+
+    score='exact' counts the loci whose allele lists are equal: MatchScore is identical loci /
+    typed loci. score='shared' counts shared alleles on per-locus allele bitsets: MatchScore is
+    shared alleles / alleles (see dna_engine.matching.score_shared_pairs), which gives partial
+    and degraded profiles credit for each allele they share. The threshold and the columns are
+    the same. The index only holds whole genotypes, so with score='shared' engine='index' scores
+    the bitsets of df directly (new_ids against all of df).
+    """
+    if score not in SCORES:
+        raise ValueError(f"Unknown score {score!r}, expected one of {SCORES}")
+    if engine == 'loop':
+        return find_matches_loop(df, sensitivity, existing_ids, score)
+    if df.empty or 'LocusName' not in df.columns or 'ReadingDateTime' not in df.columns:
+        print("No data to process or missing required columns.")
+        return pd.DataFrame(columns=['LocusName', 'SpecimenID1', 'SpecimenID2', 'MatchScore', 'LatestMatchTime'])
+
+    if score == 'shared':
+        data = df[~df['SpecimenID'].isin(existing_ids)]
+        profiles, bits = encode_profiles(data), encode_allele_bits(data)
+        if engine == 'parallel' and workers > 1 and new_ids is None:
+            new_matches = find_matches_parallel(profiles, sensitivity, workers, bits=bits)
+        else:
+            new_matches = find_shared_matches(profiles, bits, sensitivity, touched_mask(profiles, new_ids))
+    elif engine == 'index':
+        index = index if index is not None else GenotypeIndex.build(df)
+        new_matches = index.find_matches(sensitivity, existing_ids, new_ids)
+    else:
+        profiles = encode_profiles(df[~df['SpecimenID'].isin(existing_ids)])
+        if engine == 'parallel' and workers > 1:
+            new_matches = find_matches_parallel(profiles, sensitivity, workers)
+        else:
+            new_matches = find_exact_matches(profiles, sensitivity)
+
+    matches = pd.DataFrame(columns=['SpecimenID1', 'SpecimenID2', 'MatchScore', 'LatestMatchTime'])
+    if not new_matches.empty:
+        matches = pd.concat([matches, new_matches], ignore_index=True)
+    return matches
+
+def touched_mask(profiles, new_ids):
+    """ Boolean mask of the specimens of a GenotypeMatrix in new_ids (None for no restriction). """
+    return None if new_ids is None else pd.Index(profiles.specimen_ids, dtype=object).isin(new_ids)
+
+def iter_shared_matches_of(df, sensitivity, exclude_ids=(), new_ids=None):
+    """ Allele-sharing matches of the rows in df, one DataFrame per scored block (see find_matches). """
+    data = df[~df['SpecimenID'].isin(exclude_ids)]
+    profiles = encode_profiles(data)
+    return iter_shared_matches(profiles, encode_allele_bits(data), sensitivity, touched_mask(profiles, new_ids))
+
+def allele_set(alleles):
+    """ The alleles of one locus call as a set of strings, as in the allele bitsets. """
+    return {str(allele) for allele in alleles if pd.notna(allele)}
+
+def find_matches_loop(df, sensitivity, existing_ids, score='exact'):
+    """ Reference pairwise implementation of find_matches. """
+    if df.empty or 'LocusName' not in df.columns or 'ReadingDateTime' not in df.columns:
+        print("No data to process or missing required columns.")
+        return pd.DataFrame(columns=['LocusName', 'SpecimenID1', 'SpecimenID2', 'MatchScore', 'LatestMatchTime'])
+
+    # Group by SpecimenID and LocusName, then aggregate alleles into a list
+    grouped = df[df['SpecimenID'].apply(lambda x: x not in existing_ids)].groupby(['SpecimenID', 'LocusName']).agg({
+        'AlleleValue': list,
+        'CaseID': 'first',
+        'SpecimenComment': 'first',
+        'ReadingBy': 'first',
+        'ReadingDateTime': 'first'
+    }).reset_index()
+
+    # Further group by SpecimenID to get all loci for each specimen
+    specimens_grouped = grouped.groupby('SpecimenID').agg({
+        'LocusName': list,
+        'AlleleValue': list,
+        'CaseID': 'first',
+        'SpecimenComment': 'first',
+        'ReadingBy': 'first',
+        'ReadingDateTime': 'first'
+    }).reset_index()
+
+    matches = pd.DataFrame(columns=['SpecimenID1', 'SpecimenID2', 'MatchScore', 'LatestMatchTime'])
+    matches_list = []
+
+    specimen_ids = specimens_grouped['SpecimenID'].tolist()
+    loci = specimens_grouped['LocusName'].tolist()
+    alleles = specimens_grouped['AlleleValue'].tolist()
+    case_ids = specimens_grouped['CaseID'].tolist()
+    comments = specimens_grouped['SpecimenComment'].tolist()
+    readers = specimens_grouped['ReadingBy'].tolist()
+    times = specimens_grouped['ReadingDateTime'].tolist()
+
+    n = len(specimen_ids)
+    for i in range(n):
+        for j in range(i + 1, n):
+            common_loci = set(loci[i]).intersection(set(loci[j]))
+            total_loci = len(loci[i])  # Assuming both specimens have the same number of loci
+            if score == 'shared':
+                total_loci = sum(len(allele_set(locus_alleles)) for locus_alleles in alleles[i])
+            identical_loci = 0
+
+            for locus in common_loci:
+                idx_i = loci[i].index(locus)
+                idx_j = loci[j].index(locus)
+
+                if score == 'shared':
+                    identical_loci += len(allele_set(alleles[i][idx_i]) & allele_set(alleles[j][idx_j]))
+                # Ensure alleles match exactly in the same order
+                elif alleles[i][idx_i] == alleles[j][idx_j]:
+                    identical_loci += 1
+
+            if total_loci > 0:
+                match_score = identical_loci / total_loci
+            else:
+                match_score = 0
+            if match_score >= sensitivity:
+                latest_time = max(times[i], times[j])
+                matches_list.append({
+                    'SpecimenID1': specimen_ids[i],
+                    'SpecimenID2': specimen_ids[j],
+                    'MatchScore': match_score,
+                    'LatestMatchTime': latest_time,
+                    'CaseID1': case_ids[i],
+                    'CaseID2': case_ids[j],
+                    'SpecimenComment1': comments[i],
+                    'SpecimenComment2': comments[j],
+                    'ReadingBy1': readers[i],
+                    'ReadingBy2': readers[j]
+                })
+
+    if matches_list:
+        matches = pd.concat([matches, pd.DataFrame(matches_list)], ignore_index=True)
+
+    return matches
+XML_COLUMNS = ['CaseID', 'SpecimenID', 'SpecimenComment', 'LocusName', 'ReadingBy', 'ReadingDateTime', 'AlleleValue', 'FileName']
+
+def process_xml_file(file_path, ns, streaming=True):
+    """ Process a single XML file and return the data as a DataFrame.
+
+    By default the file is streamed with iterparse and each specimen or locus is freed once its
+    alleles are read; streaming=False parses the whole tree first. Either way the rows are
+    collected in one list per column (see extract_common_fields).
+    """
+    file_name=get_folder_file_name(file_path)
+    if streaming:
+        with open(file_path, 'rb') as source:
+            _, root = next(ET.iterparse(source, events=('start',)))   # only the start of the file is read
+            source.seek(0)
+            if 'CODISImportFile' in root.tag:
+                columns = read_codis_columns(ET.iterparse(source, events=('end',)), ns, file_name)
+            elif 'DNADataTransaction' in root.tag:
+                events = ET.iterparse(source, events=('start', 'end'))
+                _, root = next(events)
+                columns = read_niem_columns(events, root, ns, file_name)
+            else:
+                print("Unknown XML format.")
+                return pd.DataFrame()
+            return xml_frame(columns)
+
+    tree = ET.parse(file_path)
+    root = tree.getroot()
+
+    # Determine format by checking the root tag or other unique identifiers
+    if 'CODISImportFile' in root.tag:
+        return process_codis_format(root, ns, file_name)
+    elif 'DNADataTransaction' in root.tag:
+        return process_niem_format(root, ns, file_name)
+    else:
+        print("Unknown XML format.")
+        return pd.DataFrame()  # Return an empty DataFrame if format is not recognized
+
+def read_codis_columns(events, ns, file_name):
+    """ Allele rows from the iterparse end events of a CODIS file, as one list per XML_COLUMNS column.
+
+    Only end events are taken, as the loop over events costs more than reading the alleles. Each
+    SPECIMEN is read when it ends and then cleared, which leaves an empty element per specimen
+    under the root.
+    """
+    specimen_tag = f"{{{ns['ns']}}}SPECIMEN"
+    columns = [[] for _ in XML_COLUMNS]
+    for _, elem in events:
+        if elem.tag == specimen_tag:
+            extract_common_fields(elem, columns, ns, file_name)
+            elem.clear()
+    return columns
+
+def read_niem_columns(events, root, ns, file_name):
+    """ Allele rows from the iterparse events of a NIEM file, as one list per XML_COLUMNS column.
+
+    The file is read one DNALocus at a time. The case, specimen and device fields are the first
+    matching elements in the document, read once. Loci seen before all of them are known are held
+    back (as plain values) until they are.
+    """
+    id_tag = f"{{{ns['nc']}}}IdentificationID"
+    source_tag = f"{{{ns['biom']}}}DNASourceIdentification"
+    device_tag = f"{{{ns['biom']}}}DeviceName"
+    locus_tag = f"{{{ns['biom']}}}DNALocus"
+    header = {'case': None, 'specimen': None, 'device': None}   # first element of each kind
+    values = {}                                                 # their text, once the element ended
+    pending = []
+    stack = [root]
+    columns = [[] for _ in XML_COLUMNS]
+
+    def add(loci):
+        case_id = values['case'] if 'case' in values else header['case'].text  # AttributeError like find()
+        specimen_id = values['specimen'] if 'specimen' in values else header['specimen'].text
+        reading_by = values.get('device', "N/A")
+        for locus_name, reading_datetime, allele_values in loci:
+            add_alleles(columns, allele_values, case_id, specimen_id, "Extracted from NIEM", locus_name,
+                        reading_by, reading_datetime, file_name)
+
+    for event, elem in events:
+        if event == 'start':
+            if elem.tag == id_tag:
+                if header['case'] is None:
+                    header['case'] = elem
+                if header['specimen'] is None and stack[-1].tag == source_tag:
+                    header['specimen'] = elem
+            elif elem.tag == device_tag and header['device'] is None:
+                header['device'] = elem
+            stack.append(elem)
+            continue
+        stack.pop()
+        for key, first in header.items():
+            if elem is first:
+                values[key] = elem.text
+        if elem.tag == locus_tag:
+            reading_datetime = elem.find('biom:ProcessUTCDate', ns)
+            pending.append((elem.find('biom:DNALocusName', ns).text,
+                            reading_datetime.text if reading_datetime is not None else "Unknown",
+                            [allele.text for allele in elem.findall('.//biom:DNAAllele/biom:DNAAlleleCall1Text', ns)]))
+            stack[-1].remove(elem)
+            if len(values) == len(header):
+                add(pending)
+                pending = []
+    if pending:
+        add(pending)
+    return columns
+
+def add_alleles(columns, allele_values, case_id, specimen_id, specimen_comment, locus_name, reading_by,
+                reading_datetime, file_name):
+    """ Append one row per allele of a locus call to columns (one list per XML_COLUMNS column).
+
+    Locus fields and allele values repeat across the file, so they are interned: each row then
+    refers to one shared string instead of its own copy of the text.
+    """
+    intern = lambda value: sys.intern(value) if value is not None else None
+    n = len(allele_values)
+    for column, value in zip(columns, (case_id, specimen_id, specimen_comment, intern(locus_name), intern(reading_by),
+                                       intern(reading_datetime))):
+        column += [value] * n
+    columns[6] += map(intern, allele_values)
+    columns[7] += [file_name] * n
+
+def xml_frame(columns):
+    """ DataFrame of the XML_COLUMNS lists in columns. Each list is emptied once its column is
+    built, so the rows are not held twice at the peak. """
+    data = {}
+    for name, column in zip(XML_COLUMNS, columns):
+        data[name] = pd.Series(column)
+        column.clear()
+    return pd.DataFrame(data, columns=XML_COLUMNS)
+
+def process_codis_format(root, ns, file_name):
+    """ Process the CODIS format XML. """
+    columns = [[] for _ in XML_COLUMNS]
+    for specimen in root.findall('ns:SPECIMEN', ns):
+        extract_common_fields(specimen, columns, ns, file_name)
+    return xml_frame(columns)
+
+def process_niem_format(root, ns, file_name):
+    """ Process the NIEM format XML. """
+    data = []
+    for locus in root.findall('.//biom:DNALocus', ns):
+        case_id = root.find('.//nc:IdentificationID', ns).text
+        specimen_id = root.find('.//biom:DNASourceIdentification/nc:IdentificationID', ns).text
+        specimen_comment = "Extracted from NIEM"
+        locus_name = locus.find('biom:DNALocusName', ns).text
+        reading_datetime = locus.find('biom:ProcessUTCDate', ns).text if locus.find('biom:ProcessUTCDate', ns) is not None else "Unknown"
+        reading_by = root.find('.//biom:DeviceName', ns).text if root.find('.//biom:DeviceName', ns) is not None else "N/A"
+        
+        allele_values = locus.findall('.//biom:DNAAllele/biom:DNAAlleleCall1Text', ns)
+        for allele in allele_values:
+            allele_value = allele.text
+            data.append([
+                case_id, specimen_id, specimen_comment, locus_name,
+                reading_by, reading_datetime, allele_value, file_name
+            ])
+    return pd.DataFrame(data, columns=XML_COLUMNS)
+
+def extract_common_fields(specimen, columns, ns, file_name):
+    """ Extract fields common to both XML formats: append the allele rows of a CODIS SPECIMEN
+    element to columns, one list per XML_COLUMNS column. """
+    # Fully qualified tags take ElementTree's fast child lookup instead of a prefixed path search
+    tag = lambda name: f"{{{ns['ns']}}}{name}"
+    text = lambda elem, name, default: elem.find(tag(name)).text if elem.find(tag(name)) is not None else default
+    case_id = specimen.get('CASEID')
+    specimen_id = specimen.find(tag('SPECIMENID')).text
+    specimen_comment = text(specimen, 'SPECIMENCOMMENT', "N/A")
+    for locus in specimen.findall(tag('LOCUS')):
+        locus_name = locus.find(tag('LOCUSNAME')).text
+        reading_by = text(locus, 'READINGBY', "N/A")
+        reading_datetime = text(locus, 'READINGDATETIME', "N/A")
+        allele_values = [allele.find(tag('ALLELEVALUE')).text for allele in locus.findall(tag('ALLELE'))]
+        add_alleles(columns, allele_values, case_id, specimen_id, specimen_comment, locus_name, reading_by,
+                    reading_datetime, file_name)
+
+CSV_ALLELE_COLUMNS = ['Allele 1', 'Allele 2']
+
+def process_csv_file(file_path):
+    """ Process a GeneMapper CSV export into one row per allele, skipping blank alleles.
+
+    The Allele 1/Allele 2 columns are stacked row by row (Allele 1 then Allele 2 of each row), so
+    the rows come out in the same order as the original iterrows parser produced them.
+    """
+    df = pd.read_csv(file_path, dtype=str)
+    file_name = get_folder_file_name(file_path)  # Extract filename from file path
+    df.columns = df.columns.str.strip()
+    alleles = pd.Series(df[CSV_ALLELE_COLUMNS].to_numpy(dtype=object).ravel(), dtype=object).str.strip()
+    keep = (alleles.notna() & (alleles != '')).to_numpy()
+    rows = np.repeat(np.arange(len(df)), len(CSV_ALLELE_COLUMNS))[keep]
+
+    def column(values):
+        return pd.Series(values, dtype=object).to_numpy(dtype=object)[rows]
+
+    sample_files = column(df['Sample File'])
+    return pd.DataFrame({
+        'CaseID': column(df['Sample Name'].str.split().str[0]),  # Derived from Sample Name
+        'SpecimenID': sample_files,  # Using Sample File as SpecimenID
+        'SpecimenComment': file_name,
+        'LocusName': column(df['Marker']),
+        'ReadingBy': 'ABI3500',
+        'ReadingDateTime': '0000-00-00T00:00:00',
+        'AlleleValue': alleles.to_numpy(dtype=object)[keep],
+        'FileName': sample_files
+    }, columns=['CaseID', 'SpecimenID', 'SpecimenComment', 'LocusName', 'ReadingBy', 'ReadingDateTime', 'AlleleValue', 'FileName'])
+
+
+FILE_TYPES = {'.xml': 'XML', '.txt': 'TXT', '.csv': 'CSV'}
+COMPACT_ROWS = 200000   # parsed rows collected before their text columns are dictionary-encoded
+PARSER_VERSION = 1      # bump when the output of a parser changes, so cached parses are not reused
+XML_NAMESPACES = {
+    'ns': 'urn:CODISImportFile-schema',
+    'biom': 'http://release.niem.gov/niem/domains/biometrics/5.1/',
+    'nc': 'http://release.niem.gov/niem/niem-core/5.0/'
+}
+
+def process_file(file_path, ns):
+    """ Process a single XML, TXT or CSV file with the parser for its extension. """
+    if file_path.endswith('.xml'):
+        return process_xml_file(file_path, ns)
+    elif file_path.endswith('.txt'):
+        return process_txt_file(file_path)
+    return process_csv_file(file_path)
+
+def classify_files(folder_path, manifest, files):
+    """ Yield (file, (status, entry)) for the files of a FolderWalk, classified by the manifest as they
+    are found; the classification is None for a file that could not be read.
+
+    Files named in an old ScannedFiles list are classified first, so copies of them count as
+    duplicates. That needs the whole list, so the files are only streamed when there are none.
+    """
+    def classify(file):
+        try:
+            return manifest.classify(folder_path, file[0], file[3])
+        except OSError as e:
+            print(f"Error processing {file[1]}: {e}")
+
+    if not manifest.legacy_names:
+        for file in files:
+            yield file, classify(file)
+        return
+    files = list(files)
+    classified = {}
+    for position in sorted(range(len(files)), key=lambda k: files[k][1] not in manifest.legacy_names):
+        classified[position] = classify(files[position])
+    for position, file in enumerate(files):
+        yield file, classified[position]
+
+def stable_files(walk, snapshot):
+    """ The files of a walk that are as they were in snapshot (see folder_snapshot). The others, such as
+    files still being copied, are left for a later run, and their folders are listed again then. """
+    for file in walk:
+        file_path, _, _, stat = file
+        if stat is not None and (file_path, stat.st_size, stat.st_mtime_ns) in snapshot:
+            yield file
+        else:
+            walk.forget(file_path)
+
+def new_files(folder_path, manifest, walk, metrics, cache, pool, snapshot=None):
+    """ Yield (path, name, type, status, entry, digest, rows) for the new and changed files of a walk.
+
+    rows are the cached rows of the file, the future of its parse when a pool is given (the
+    parse starts right away), or None. digest is the content hash for the parse cache. With a
+    snapshot, only the files in it are considered (see stable_files).
+    """
+    found = walk if snapshot is None else stable_files(walk, snapshot)
+    for (file_path, file_name, file_type, stat), classified in classify_files(folder_path, manifest, found):
+        if classified is None:
+            walk.forget(file_path)
+            continue
+        status, entry = classified
+        if status == 'duplicate':
+            print(f"Skipping {file_type} file {entry[0]}: identical to {entry[4]}")
+            metrics.count('ingest', 'duplicate_files')
+            continue
+        if status == 'unchanged':
+            continue
+        digest = rows = None
+        if cache is not None:
+            try:
+                digest = entry[3] or file_digest(file_path)
+                rows = cache.get(digest, get_folder_file_name(file_path))
+            except OSError:
+                pass
+            if rows is not None:
+                metrics.count('ingest', 'cache_hits')
+        if rows is None and pool:
+            rows = pool.submit(process_file, file_path, XML_NAMESPACES)
+        yield file_path, file_name, file_type, status, entry, digest, rows
+
+def read_ahead(items, count):
+    """ Yield the items of a generator in order, keeping it count items ahead. """
+    waiting = deque()
+    for item in items:
+        waiting.append(item)
+        if len(waiting) > count:
+            yield waiting.popleft()
+    yield from waiting
+
+def scan_and_process_files(folder_path, manifest, workers=1, metrics=NO_METRICS, cache=None, control=NO_CONTROL,
+                           prune_folders=False, snapshot=None):
+    """ Scan the folder and all subfolders for XML, TXT, and CSV files and process them into a DataFrame.
+
+    The folders are listed concurrently by a dna_engine.discovery.FolderWalk, and files are
+    processed as they are found, while the walk goes on. Files the manifest already holds with
+    the same size and modification time are skipped without being opened, and files with the
+    same content as an ingested file are reported and skipped. With prune_folders, folders whose
+    modification time is the one recorded at the last complete scan are not listed at all (files
+    rewritten in place in them are then missed). With workers > 1 the files are parsed in a
+    process pool, a few files ahead. Results are still merged in the order os.walk would find
+    them, so the output and the manifest match a single-process run. File and row counts are
+    added to the 'ingest' stage of metrics.
+
+    Each row gets a SourceFile column with the manifest key of its file. Parsed rows are
+    dictionary-encoded (see dna_engine.categorical) in batches of about COMPACT_ROWS rows, so
+    only one batch is ever held as Python strings.
+
+    With a ParseCache, files whose content was parsed before (into any output folder) are read
+    from the cache instead of being parsed, and newly parsed files are added to it.
+
+    control (a dna_engine.jobs.JobControl) gets the 'ingest' progress in files (with no total,
+    as the walk is still going), and is checked for cancellation before each file.
+
+    With a snapshot from folder_snapshot, only files with the size and modification time they had
+    in it are processed, so files that arrived or changed since are not read half written.
+
+    Files recorded as copies of a file that has since changed (its bytes or all its rows) are read
+    last, as the rows they shared with it are replaced by its new rows (see ScanManifest.replaced).
+    """
+    walk = FolderWalk(folder_path, FILE_TYPES, known_folders=manifest.folders if prune_folders else None)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    files = new_files(folder_path, manifest, walk, metrics, cache, pool, snapshot)
+    all_data, pending = [], []
+
+    def add(file_data, entry):
+        nonlocal pending
+        file_data['SourceFile'] = entry[0]   # for the duplicate report, and stored to replace the rows later
+        pending.append(file_data)
+        if sum(len(frame) for frame in pending) >= COMPACT_ROWS:
+            all_data.append(compact_rows(pd.concat(pending, ignore_index=True)))
+            pending = []
+        manifest.record(entry)
+        metrics.count('ingest', 'files')
+        metrics.count('ingest', 'bytes', entry[1])
+        metrics.count('ingest', 'rows', len(file_data))
+
+    try:
+        for done, item in enumerate(read_ahead(files, 2 * workers if pool else 0)):
+            file_path, file_name, file_type, status, entry, digest, file_data = item
+            control.check()
+            control.progress('ingest', done)
+            cached = isinstance(file_data, pd.DataFrame)
+            print(f"Found {status} {file_type} file: {entry[0]}, {'reading cached rows' if cached else 'processing'}...")
+            try:
+                if not cached:
+                    file_data = file_data.result() if pool else process_file(file_path, XML_NAMESPACES)
+                    if digest:
+                        cache.put(digest, get_folder_file_name(file_path), file_data)
+                add(file_data, entry)
+            except Exception as e:
+                print(f"Error processing {file_name}: {e}")
+                metrics.count('ingest', 'failed_files')
+                walk.forget(file_path)
+        for entry in manifest.stale_copies():
+            file_path = os.path.join(folder_path, *entry[0].split('/'))
+            if not os.path.isfile(file_path):
+                continue
+            print(f"Found {entry[0]}, a copy of the previous {entry[4]}, processing...")
+            try:
+                add(process_file(file_path, XML_NAMESPACES), entry[:4] + (None,))
+            except Exception as e:
+                print(f"Error processing {entry[0]}: {e}")
+                metrics.count('ingest', 'failed_files')
+    finally:
+        files.close()
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    if walk.complete:
+        manifest.folders = walk.folders
+    metrics.count('ingest', 'folders_listed', walk.listed)
+    metrics.count('ingest', 'folders_pruned', walk.pruned)
+    if pending:
+        all_data.append(compact_rows(pd.concat(pending, ignore_index=True)))
+    if all_data:
+        combined_data = concat_rows(all_data)
+        print("All new files processed.")
+        return combined_data, manifest
+    else:
+        print("No new files to process.")
+        return pd.DataFrame(), manifest
+    
+def unmelting_data(df):
+    """ Pivot the long allele table into one row per specimen reading with <locus>_1/<locus>_2 columns.
+
+    Vectorized: alleles are ranked within each (specimen, locus) and unstacked into the locus
+    columns (see dna_engine.summary.pivot_alleles). Same output as the original pivot_table
+    version, which benchmarks/bench_unmelting.py compares it with.
+    """
+    if df.empty:
+        return df
+    return order_rows(pivot_alleles(clean_locus_names(df)))
+
+def get_folder_file_name(file_path):
+    """Construct a file name that includes its parent folder's name."""
+    folder_name = os.path.basename(os.path.dirname(file_path))  # Get the name of the parent directory
+    file_name = os.path.basename(file_path)  # Get the base file name
+    return os.path.join(folder_name, file_name)  # Combine folder name and file name
+
+TXT_COLUMNS = ['CaseID', 'SpecimenID', 'SpecimenComment', 'LocusName', 'ReadingBy', 'ReadingDateTime', 'AlleleValue', 'FileName']
+
+def is_txt_allele(part):
+    """ Whether a field of a TXT allele row is an allele call (a repeat number, or X/Y). """
+    return part.replace('.', '', 1).isdigit() or part in ['X', 'Y']
+
+def read_txt_header(lines):
+    """ (CaseID, ReadingBy, ReadingDateTime) from the header of an ABI/ANDE TXT export.
+
+    Consumes lines up to and including the Sample header line that starts the allele table, so the
+    same iterator can be passed on to iter_txt_alleles. The fields are read as the original
+    readlines() parser read them (see benchmarks/bench_txt_parsing.py).
+    """
+    case_id = reading_by = reading_datetime = ""
+    for line in lines:
+        if line.startswith("\tSample"):
+            break
+        if "Project:" in line:
+            case_id = line.split("\\")[-2]  # Assumes case ID is in a specific position in the path
+        if "Software Package:" in line:
+            reading_by = line.split(":")[1].strip()
+        if "Date/Time:" in line:
+            reading_datetime = line.split(":")[1].strip()
+    return case_id, reading_by, reading_datetime
+
+def iter_txt_alleles(lines):
+    """ Yield (SpecimenID, LocusName, AlleleValue) for each allele in the rows of a TXT allele table.
+
+    A row starting with a sample number opens a new specimen; the rows after it hold its other
+    loci. Repeated names and alleles are yielded as the same string object.
+    """
+    strings = {}
+    specimen_id = None
+    for line in lines:
+        if line.startswith("\tSample") or not line.strip():
+            continue
+        clean_parts = [part.strip() for part in line.strip().split("\t") if part.strip()]
+        if clean_parts[0].isdigit():
+            specimen_id = clean_parts[1]
+            clean_parts = clean_parts[2:]
+        locus_name = strings.setdefault(clean_parts[0], clean_parts[0])
+        for allele_value in clean_parts[1:]:
+            if is_txt_allele(allele_value):
+                yield specimen_id, locus_name, strings.setdefault(allele_value, allele_value)
+
+# Parsing logic with automated header extraction and robust data handling
+def process_txt_file(file_path):
+    """ Parse an ABI/ANDE TXT allele export in one pass over its lines.
+
+    The header is read until the allele table starts, then the alleles stream into one buffer
+    per varying column, so no line list or per-allele dict is held. Same rows as the original
+    readlines() parser, except that header keys are no longer looked for inside the table.
+    """
+    file_name = get_folder_file_name(file_path)  # Extract filename from file path
+    specimen_ids, locus_names, allele_values = [], [], []
+    with open(file_path, 'r') as file:
+        case_id, reading_by, reading_datetime = read_txt_header(file)
+        for specimen_id, locus_name, allele_value in iter_txt_alleles(file):
+            specimen_ids.append(specimen_id)
+            locus_names.append(locus_name)
+            allele_values.append(allele_value)
+
+    if not allele_values:
+        return pd.DataFrame()
+    n = len(allele_values)
+    return pd.DataFrame({
+        "CaseID": [case_id] * n,
+        "SpecimenID": specimen_ids,
+        "SpecimenComment": [""] * n,
+        "LocusName": locus_names,
+        "ReadingBy": [reading_by] * n,
+        "ReadingDateTime": [reading_datetime] * n,
+        "AlleleValue": allele_values,
+        "FileName": [file_name] * n,
+    }, columns=TXT_COLUMNS)
+
+def save_matches(store, new_matches, matches_file_path, changed=False):
+    """ Add new matches to the store and write DNA_matches.csv sorted by LatestMatchTime.
+
+    The CSV is only appended to when the new matches sort after every stored one, no match time is
+    unknown and nothing was removed; otherwise it is exported again from the store.
+    """
+    if not new_matches.empty or changed:
+        in_order = store.append_matches(new_matches)
+        if in_order and not changed:
+            store.export_matches_csv(matches_file_path, new_matches)
+        else:
+            store.export_matches_csv(matches_file_path)
+        print("Updated matches have been saved to 'DNA_matches.csv'.")
+    else:
+        print("No new matches found to append.")
+
+def save_matches_streamed(store, chunks, matches_file_path, memory_budget, changed=False):
+    """ save_matches for match DataFrames that arrive in chunks, keeping about memory_budget MiB.
+
+    Each chunk is stored and spilled to a sorted run file as soon as it is found. If the new
+    matches all sort after the stored ones (and no time is unknown), the runs are merged on LatestMatchTime (an external
+    merge sort) and appended to DNA_matches.csv; otherwise the CSV is exported again from the
+    store, which reads the matches in time order in chunks. Returns the number of new matches.
+    """
+    latest, unknown = store.latest_match_time(), store.unknown_match_times()
+    with MatchSpill(budget_rows(memory_budget), os.path.dirname(matches_file_path)) as spill:
+        for chunk in chunks:
+            store.append_matches(chunk)
+            spill.add(chunk)
+        if not len(spill) and not changed:
+            print("No new matches found to append.")
+            return 0
+        # Unknown times sort first, so rows with one (new or stored) can only go in by a new export
+        in_order = not (unknown or spill.unknown_times) and (latest is None or spill.earliest is None
+                                                             or spill.earliest >= latest)
+        if in_order and not changed and has_header(matches_file_path, MATCH_FILE_COLUMNS):
+            spill.write_csv(matches_file_path, append=True)
+        else:
+            store.export_matches_csv(matches_file_path)
+        print("Updated matches have been saved to 'DNA_matches.csv'.")
+        return len(spill)
+
+def report_duplicates(duplicates):
+    """ Print the rows skipped from each file: rows repeated within it, or all of its rows when it
+    is a copy of another file, such as the same instrument export saved again under a different
+    name (see DataStore.append_rows). The rows themselves are written to duplicate_rows.csv.
+    """
+    for source, originals in duplicates.groupby('SourceFile', dropna=False, sort=False)['DuplicateOf']:
+        original = originals.iloc[0]
+        if original == source:
+            print(f"Skipped {len(originals)} repeated rows within {source}.")
+        else:
+            print(f"All {len(originals)} rows of {source} are already stored from {original}: skipped as a re-exported copy.")
+
+def copied_files(duplicates):
+    """ {file: the file it is a copy of} for the files append_rows skipped as re-exported copies. """
+    copies = duplicates[duplicates['DuplicateOf'] != duplicates['SourceFile']]
+    return dict(zip(copies['SourceFile'], copies['DuplicateOf']))
+
+def open_store(data_file_path, matches_file_path):
+    """ Open the data store next to the data file, importing the CSV files on first use. """
+    store = DataStore(os.path.splitext(data_file_path)[0] + '.sqlite')
+    if store.created:
+        df = load_data(data_file_path)
+        if df.empty:
+            return store
+        print(f"Importing {data_file_path} into {store.path}")
+        store.append_rows(df)
+        _, matches_df = load_existing_matches(matches_file_path)
+        if not matches_df.empty:
+            store.append_matches(matches_df)
+        store.export_matches_csv(matches_file_path)
+    return store
+
+class Pipeline:
+    """ Output files, data store, scan manifest and genotype index for one input folder.
+
+    Everything is opened once, so repeated run() calls (as in watch mode) only scan the folder
+    and process what is new, without reloading the stored data. Use main() for a single run.
+    """
+
+    def __init__(self, xml_folder_path, save_to_folder_path=None, sensitivity=None, workers=1, hash_files=True,
+                 match_workers=1, memory_budget=None, cache_mib=DEFAULT_CACHE_MIB, prune_folders=False, score='exact'):
+        if score not in SCORES:
+            raise ValueError(f"Unknown score {score!r}, expected one of {SCORES}")
+        if save_to_folder_path is None:
+            ensure_files_exist(xml_folder_path)
+            self.data_file_path, self.matches_file_path, self.settings_file_path = get_file_paths(xml_folder_path)
+            self.unmelted_df_file_path = os.path.join(os.path.dirname(xml_folder_path), 'final_DNA_sequencing_summary.csv')
+        else:
+            ensure_files_exist(save_to_folder_path, diffrent_folder=True)
+            self.data_file_path, self.matches_file_path, self.settings_file_path = get_file_paths(save_to_folder_path, diffrent_folder=True)
+            self.unmelted_df_file_path = os.path.join(save_to_folder_path, 'final_DNA_sequencing_summary.csv')
+
+        stored_sensitivity, scanned_files, _ = load_settings(self.settings_file_path)
+        self.sensitivity = stored_sensitivity if sensitivity is None else sensitivity
+        self.xml_folder_path = xml_folder_path
+        self.output_folder_path = os.path.dirname(self.settings_file_path)
+        self.workers = workers
+        self.prune_folders = prune_folders   # skip folders unchanged since the last scan (see scan_and_process_files)
+        self.match_workers = match_workers   # > 1: full matching scores all pairs in tiles on that many processes
+        self.memory_budget = memory_budget   # MiB for matching; set: stream matches to disk instead of collecting them
+        self.score = score                   # 'exact' or 'shared' (allele sharing), see find_matches
+        self.cache = ParseCache(max_bytes=cache_mib * 2 ** 20, version=PARSER_VERSION) if cache_mib else None
+
+        self.store = open_store(self.data_file_path, self.matches_file_path)
+        self.hash_files = hash_files
+        self.legacy_names = scanned_files
+        self.manifest = self.load_manifest()
+        self.index_file_path = os.path.join(os.path.dirname(self.data_file_path), 'genotype_index.pkl')
+        self.duplicates_file_path = os.path.join(self.output_folder_path, 'duplicate_rows.csv')
+        self.index = None
+        self.summary = None   # final summary as last written, reused by incremental updates
+
+    def close(self):
+        self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def load_manifest(self):
+        return ScanManifest(self.store.read_manifest(), hash_files=self.hash_files, legacy_names=self.legacy_names,
+                            folders=self.store.read_folders())
+
+    def recover(self):
+        """ Undo what a failed run left outside the store, whose own changes were rolled back.
+
+        The manifest is reloaded, so the files of the run are read again next time, and the CSV
+        files and the final summary, which may hold rows of the run, are written again from the store.
+        """
+        print("The run did not complete; nothing of it was stored. Writing the result files again from the store.")
+        self.manifest = self.load_manifest()
+        self.index = None   # it may hold specimens of the run; rebuilt as the store's generation was rolled back
+        self.summary = None
+        try:
+            self.store.export_rows_csv(self.data_file_path)
+            self.store.export_matches_csv(self.matches_file_path)
+            if os.path.exists(self.unmelted_df_file_path):
+                unmelting_data(self.store.read_rows()).to_csv(self.unmelted_df_file_path, index=False)
+        except Exception as e:
+            print(f"Could not write the result files again: {e}")
+
+    def load_index(self):
+        """ Genotype index of the stored data, reused while the store is unchanged. """
+        if self.index is None or self.index.source != self.store.generation:
+            self.index = load_or_build_index(self.index_file_path, self.store.generation,
+                                             lambda: self.store.read_rows(MATCH_DATA_COLUMNS))
+        return self.index
+
+    def run(self, incremental=True, incremental_summary=True, metrics=True, profile=False, control=NO_CONTROL,
+            snapshot=None):
+        """ Scan the input folder once and process the new files; returns the number of new rows.
+
+        With metrics, the time, counters and peak memory of each stage are written to
+        run_metrics.json next to settings.csv. With profile, a cProfile of the run is saved to
+        run_profile.prof (read it with `python -m pstats run_profile.prof`). control (a
+        dna_engine.jobs.JobControl) gets the progress of each stage. A cancellation is honoured
+        until the files are scanned, before anything is saved; after that the run completes, so
+        the store, the index and the result files stay consistent. The new rows, their matches and
+        the scan manifest are committed to the store together: if the run fails, none of them is,
+        and its files are processed again by the next run. With a snapshot (see folder_snapshot),
+        only the files in it are processed.
+        """
+        metrics = Metrics() if metrics else NO_METRICS
+        profiler = cProfile.Profile() if profile else None
+        if profiler:
+            profiler.enable()
+        try:
+            added = self._run(incremental, incremental_summary, metrics, control, snapshot)
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.output_folder_path, 'run_profile.prof'))
+        metrics.set('sensitivity', float(self.sensitivity))
+        metrics.set('incremental', incremental)
+        metrics.set('stored_rows', self.store.row_count() if metrics.enabled else None)
+        metrics.write(os.path.join(self.output_folder_path, 'run_metrics.json'))
+        return added
+
+    def _run(self, incremental, incremental_summary, metrics, control, snapshot):
+        with metrics.stage('ingest'):
+            new_data, _ = scan_and_process_files(self.xml_folder_path, self.manifest, self.workers, metrics, self.cache,
+                                                 control, self.prune_folders, snapshot)
+        control.check()   # last point to stop: nothing has been saved yet
+        try:
+            with self.store.transaction():
+                added = self._save(new_data, incremental, incremental_summary, metrics, control)
+        except BaseException:
+            self.recover()
+            raise
+        self.manifest.updates, self.manifest.replaced = [], []
+        return len(added)
+
+    def _save(self, new_data, incremental, incremental_summary, metrics, control):
+        """ Store and match the new rows, then record the scanned files; returns the rows added. """
+        store, sensitivity = self.store, self.sensitivity
+        control.progress('matching')
+        with metrics.stage('matching'):
+            index = self.load_index()
+        if not incremental and self.score == 'shared':
+            with metrics.stage('matching'):
+                rows = store.read_rows(MATCH_DATA_COLUMNS)
+                if self.memory_budget:
+                    chunks = iter_shared_matches_of(rows, sensitivity, store.matched_ids())
+                    found = save_matches_streamed(store, chunks, self.matches_file_path, self.memory_budget / 2)
+                else:
+                    new_matches = find_matches(rows, sensitivity, store.matched_ids(), workers=self.match_workers,
+                                               engine='parallel' if self.match_workers > 1 else 'numpy', score='shared')
+                    found = len(new_matches)
+                metrics.count('matching', 'matches', found)
+            if not self.memory_budget:
+                with metrics.stage('write'):
+                    save_matches(store, new_matches, self.matches_file_path)
+        elif not incremental and self.memory_budget:
+            with metrics.stage('matching'):
+                compared = index.pairs_compared
+                chunks = index.iter_matches(sensitivity, store.matched_ids(),
+                                            pair_budget=pair_budget(self.memory_budget / 2, len(index.profiles.loci)))
+                found = save_matches_streamed(store, chunks, self.matches_file_path, self.memory_budget / 2)
+                metrics.count('matching', 'pairs_compared', index.pairs_compared - compared)
+                metrics.count('matching', 'matches', found)
+        elif not incremental:
+            with metrics.stage('matching'):
+                if self.match_workers > 1:
+                    new_matches = find_matches(store.read_rows(MATCH_DATA_COLUMNS), sensitivity, store.matched_ids(),
+                                               engine='parallel', workers=self.match_workers)
+                else:
+                    compared = index.pairs_compared
+                    new_matches = find_matches(store.read_rows(MATCH_DATA_COLUMNS), sensitivity, store.matched_ids(),
+                                               engine='index', index=index)
+                    metrics.count('matching', 'pairs_compared', index.pairs_compared - compared)
+                metrics.count('matching', 'matches', len(new_matches))
+            with metrics.stage('write'):
+                save_matches(store, new_matches, self.matches_file_path)
+
+        added = new_data
+        # The rows stored from files that changed since are replaced by the ones read now
+        replaced_ids = store.delete_rows(self.manifest.replaced)
+        if replaced_ids:
+            print(f"Removed the earlier rows of {len(set(self.manifest.replaced))} changed files "
+                  f"({len(replaced_ids)} specimens).")
+        if not new_data.empty or replaced_ids:
+            control.progress('dedup')
+            with metrics.stage('dedup'):
+                added, duplicates = store.append_rows(new_data)
+                metrics.count('dedup', 'rows', len(new_data))
+                metrics.count('dedup', 'duplicates', len(duplicates))
+            report_duplicates(duplicates)
+            # Read again if the file they copy changes, as their rows are not stored (see ScanManifest.stale_copies)
+            self.manifest.record_copies(copied_files(duplicates))
+            print(f"Removed {len(duplicates)} duplicates; {store.row_count()} entries remain.")
+            with metrics.stage('write'):
+                store.export_rows_csv(self.data_file_path, None if replaced_ids else added)
+                duplicates.to_csv(self.duplicates_file_path, index=False)
+            # Specimens that gained or lost rows: rows skipped as duplicates (e.g. a re-exported file) change nothing
+            touched_ids = list(dict.fromkeys([*replaced_ids, *added['SpecimenID'].dropna().unique()]))
+            control.progress('pivot')
+            with metrics.stage('pivot'):
+                if incremental_summary and os.path.exists(self.unmelted_df_file_path):
+                    # Only the touched specimens are re-pivoted
+                    if len(touched_ids):
+                        self.summary = update_summary(self.unmelted_df_file_path, store.read_rows(specimen_ids=touched_ids),
+                                                      touched_ids, self.summary)
+                    metrics.count('pivot', 'specimens', len(touched_ids))
+                else:
+                    self.summary = unmelting_data(store.read_rows())
+                    self.summary.to_csv(self.unmelted_df_file_path, index=False)
+                    metrics.count('pivot', 'specimens', self.summary['SpecimenID'].nunique() if len(self.summary) else 0)
+            print(f"Data saved to {self.unmelted_df_file_path}")
+
+            control.progress('matching')
+            new_ids = touched_ids
+            if incremental and not len(new_ids):
+                print("No new specimens to match.")
+            elif incremental and self.memory_budget:
+                with metrics.stage('matching'):
+                    batch = store.read_rows(MATCH_DATA_COLUMNS, specimen_ids=new_ids)
+                    self.index = index = index.update(encode_profiles(batch), store.generation, replaced=new_ids)
+                    index.save(self.index_file_path)
+                    # Pairs with a re-typed specimen are removed first, then re-scored as they stream in
+                    stale = store.delete_matches(new_ids)
+                    if self.score == 'shared':
+                        chunks = iter_shared_matches_of(store.read_rows(MATCH_DATA_COLUMNS), sensitivity, (), new_ids)
+                    else:
+                        chunks = index.iter_matches(sensitivity, (), new_ids,
+                                                    pair_budget=pair_budget(self.memory_budget / 2, len(index.profiles.loci)))
+                    found = save_matches_streamed(store, chunks, self.matches_file_path, self.memory_budget / 2,
+                                                  changed=stale > 0)
+                    metrics.count('matching', 'specimens', len(new_ids))
+                    metrics.count('matching', 'pairs_compared', index.pairs_compared)
+                    metrics.count('matching', 'matches', found)
+            elif incremental:
+                with metrics.stage('matching'):
+                    # Re-encode the touched specimens from all their stored rows; those left without rows are dropped
+                    batch = store.read_rows(MATCH_DATA_COLUMNS, specimen_ids=new_ids)
+                    self.index = index = index.update(encode_profiles(batch), store.generation, replaced=new_ids)
+                    if self.score == 'shared':
+                        new_matches = find_matches(store.read_rows(MATCH_DATA_COLUMNS), sensitivity, set(), new_ids=new_ids,
+                                                   score='shared')
+                    else:
+                        new_matches = find_matches(batch, sensitivity, set(), engine='index', index=index, new_ids=new_ids)
+                    metrics.count('matching', 'specimens', len(new_ids))
+                    metrics.count('matching', 'pairs_compared', index.pairs_compared)
+                    metrics.count('matching', 'matches', len(new_matches))
+                with metrics.stage('write'):
+                    index.save(self.index_file_path)
+                    # Pairs with a re-typed specimen were just re-scored
+                    stale = store.delete_matches(new_ids)
+                    save_matches(store, new_matches, self.matches_file_path, changed=stale > 0)
+            elif replaced_ids and store.delete_matches(replaced_ids):
+                # Matched above, before the rows were replaced: the specimens are matched again next run
+                store.export_matches_csv(self.matches_file_path)
+        elif incremental:
+            print("No new specimens to match.")
+
+        # Save updated settings
+        control.progress('write')
+        with metrics.stage('write'):
+            # Last, so files are only recorded as ingested once their rows and matches are stored
+            store.write_manifest(self.manifest.updates)
+            store.write_folders(self.manifest.folders)
+            settings_df = pd.DataFrame({'Sensitivity': [sensitivity], 'ScannedFiles': [""]})
+            save_settings(settings_df, self.settings_file_path)
+        return added
+
+
+def main(xml_folder_path, save_to_folder_path=None, sensitivity=None, incremental=True, workers=1, hash_files=True,
+         incremental_summary=True, metrics=True, profile=False, match_workers=1, memory_budget=None,
+         cache_mib=DEFAULT_CACHE_MIB, control=NO_CONTROL, prune_folders=False, score='exact'):
+    """ Scan the input folder, update the data files and find matches.
+
+    The allele rows and matches are kept in sequencing_summary.sqlite next to the CSV files, which
+    are written as exports of it. With incremental=True the genotype index next to the data file is
+    the profile store: only the specimens in the newly scanned files are scored, against the
+    stored profiles and each other. With incremental=False the stored data is matched as a whole,
+    skipping specimens that already have a match. workers > 1 parses the new files in that many
+    processes. hash_files=False turns off content hashing (and so duplicate file detection) in
+    the scan manifest. With incremental_summary, final_DNA_sequencing_summary.csv is updated by
+    re-pivoting only the specimens that got new rows; otherwise it is rebuilt from all the data.
+    metrics writes run_metrics.json next to settings.csv and profile writes run_profile.prof
+    (see Pipeline.run). match_workers > 1 makes the full (incremental=False) matching score every
+    pair in tiles on that many processes instead of using the index. With memory_budget (MiB),
+    matches are written to disk as they are found and sorted with an external merge sort, so
+    matching memory stays bounded however many matches there are. Parsed files are kept in a
+    local ParseCache of up to cache_mib MiB (0 turns it off), shared by all output folders.
+    control reports progress and allows cancelling the run (see Pipeline.run). prune_folders skips
+    the folders that have not changed since the last scan (see scan_and_process_files).
+    score='shared' scores pairs on shared alleles instead of identical loci (see find_matches).
+    """
+    with Pipeline(xml_folder_path, save_to_folder_path, sensitivity, workers, hash_files, match_workers,
+                  memory_budget, cache_mib, prune_folders, score) as pipeline:
+        pipeline.run(incremental, incremental_summary, metrics, profile, control)
+
+
+class ProfileSearch:
+    """ Top-k searches of single profiles against the specimens stored in an output folder.
+
+    The genotype index is loaded (or built and saved) once when the search is created, so each
+    query only looks up the postings of its own genotypes. Scores follow find_matches. The store
+    is only read: a folder without sequencing_summary.sqlite (e.g. only CSV files from an older
+    version) has to be processed by a run first.
+    """
+
+    def __init__(self, output_folder_path):
+        data_file_path, _, _ = get_file_paths(output_folder_path, diffrent_folder=True)
+        store_path = os.path.splitext(data_file_path)[0] + '.sqlite'
+        if not os.path.exists(store_path):
+            raise FileNotFoundError(f"No stored data in {output_folder_path}: {os.path.basename(store_path)} is "
+                                    f"missing. Process an input folder into it first.")
+        with DataStore(store_path, read_only=True) as store:
+            self.index = load_or_build_index(os.path.join(output_folder_path, 'genotype_index.pkl'), store.generation,
+                                             lambda: store.read_rows(MATCH_DATA_COLUMNS))
+
+    def search(self, profile, k=10, specimen_id=None):
+        """ (top-k DataFrame, milliseconds) for a profile {locus: [alleles]}, best match first. """
+        start = time.perf_counter()
+        result = self.index.search(profile, k, specimen_id)
+        return result, (time.perf_counter() - start) * 1000
+
+    def search_file(self, file_path, k=10, specimen_id=None):
+        """ Search every specimen of an input file (or only specimen_id); {SpecimenID: (result, ms)}. """
+        profiles = profiles_from_rows(process_file(file_path, XML_NAMESPACES))
+        if specimen_id is not None:
+            if specimen_id not in profiles:
+                raise KeyError(f"Specimen {specimen_id} is not in {file_path}")
+            profiles = {specimen_id: profiles[specimen_id]}
+        return {specimen: self.search(profile, k, specimen) for specimen, profile in profiles.items()}
+
+def folder_snapshot(folder_path):
+    """ (path, size, mtime) of every input file under folder_path, to notice new or changing files. """
+    return frozenset((file_path, stat.st_size, stat.st_mtime_ns)
+                     for file_path, _, _, stat in FolderWalk(folder_path, FILE_TYPES)
+                     if stat is not None)   # None: removed while scanning
+
+RETRY_SECONDS = 60   # a failed watch run is tried again after this long, or sooner if the folder changes
+
+def watch(xml_folder_path, save_to_folder_path=None, sensitivity=None, interval=2.0, workers=1, hash_files=True,
+          max_runs=None, metrics=True, memory_budget=None, cache_mib=DEFAULT_CACHE_MIB, prune_folders=False,
+          score='exact'):
+    """ Keep processing the input folder as instrument output arrives, until interrupted.
+
+    The folder is polled every interval seconds. Once the set of files has changed and then stayed
+    the same for one more poll, the new files of that stable snapshot are ingested and matched
+    incrementally; files that arrived or changed after the poll wait for a later run, so files
+    still being copied are not read half written. The store, the scan manifest and the genotype
+    index stay loaded between runs. A run that fails is reported and stores nothing (see
+    Pipeline.run); it is tried again after RETRY_SECONDS or once the folder changes. max_runs
+    stops after that many ingestion runs, failed ones included (None: never). run_metrics.json
+    holds the metrics of the latest run.
+    """
+    runs, failed_at = 0, None
+    with Pipeline(xml_folder_path, save_to_folder_path, sensitivity, workers, hash_files,
+                  memory_budget=memory_budget, cache_mib=cache_mib, prune_folders=prune_folders, score=score) as pipeline:
+        print(f"Watching {xml_folder_path} every {interval:g} s (Ctrl+C to stop)")
+        processed, previous = None, None
+        try:
+            while max_runs is None or runs < max_runs:
+                snapshot = folder_snapshot(xml_folder_path)
+                retry = failed_at is not None and time.monotonic() - failed_at >= RETRY_SECONDS
+                if (snapshot != processed or retry) and snapshot == previous:
+                    try:
+                        pipeline.run(metrics=metrics, snapshot=snapshot)
+                        failed_at = None
+                    except Exception:
+                        print(f"The run failed and is retried in {RETRY_SECONDS} s or when the folder changes:\n"
+                              f"{traceback.format_exc()}")
+                        failed_at = time.monotonic()
+                    processed = snapshot
+                    runs += 1
+                previous = snapshot
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+    return runs
@@ -0,0 +1,103 @@
+""" Match rows spilled to sorted run files and merged back in LatestMatchTime order (external merge sort). """
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from dna_engine.store import MATCH_FILE_COLUMNS, normalise_times
+
+MATCH_ROW_BYTES = 2048   # rough in-memory size of one buffered match row
+
+
+def budget_rows(memory_budget_mib):
+    """ Match rows to buffer before writing a run, for a memory budget in MiB. """
+    return max(1000, int(memory_budget_mib * 2 ** 20 // MATCH_ROW_BYTES))
+
+
+def time_key(row):
+    """ Sort key of a run row: unknown times first, like ORDER BY in SQLite. """
+    time = row[MATCH_FILE_COLUMNS.index('LatestMatchTime')]
+    return (time != '', time)
+
+
+class MatchSpill:
+    """ Collects match DataFrames on disk as sorted runs of at most run_rows rows.
+
+    Rows are buffered until run_rows is reached, sorted (stably) on the normalised
+    LatestMatchTime and written to a run file. merged() streams all rows back in one sorted
+    order with a k-way merge; ties keep the order the rows were added in, as ORDER BY
+    "LatestMatchTime", rowid does in the store. Only the buffer and one line per run are held in
+    memory.
+    """
+
+    def __init__(self, run_rows=100000, folder=None):
+        self.run_rows = run_rows
+        self.folder = tempfile.mkdtemp(prefix='dna_matches_', dir=folder)
+        self.runs = []
+        self.buffer = []
+        self.buffered = 0
+        self.rows = 0
+        self.earliest = None          # earliest normalised time added
+        self.unknown_times = False    # whether any row has no time
+
+    def __len__(self):
+        return self.rows
+
+    def add(self, matches):
+        if matches.empty:
+            return
+        rows = matches.reindex(columns=MATCH_FILE_COLUMNS)
+        times = normalise_times(rows['LatestMatchTime'])
+        rows['LatestMatchTime'] = times
+        known = [time for time in times if time is not None]
+        if known:
+            self.earliest = min(known) if self.earliest is None else min(self.earliest, min(known))
+        self.unknown_times |= len(known) < len(rows)
+        self.buffer.append(rows)
+        self.buffered += len(rows)
+        self.rows += len(rows)
+        if self.buffered >= self.run_rows:
+            self.flush()
+
+    def flush(self):
+        """ Write the buffered rows as one sorted run. """
+        if not self.buffer:
+            return
+        rows = pd.concat(self.buffer, ignore_index=True)
+        self.buffer, self.buffered = [], 0
+        times = rows['LatestMatchTime']
+        order = pd.DataFrame({'known': times.notna(), 'time': times.fillna('')}).sort_values(['known', 'time'], kind='stable').index
+        rows = rows.loc[order]
+        path = os.path.join(self.folder, f'run_{len(self.runs):05d}.csv')
+        rows.to_csv(path, header=False, index=False)
+        self.runs.append(path)
+
+    def merged(self):
+        """ Yield all rows as lists of strings ('' for missing) in LatestMatchTime order. """
+        self.flush()
+        files = [open(path, newline='', encoding='utf-8') for path in self.runs]
+        try:
+            yield from heapq.merge(*(csv.reader(file) for file in files), key=time_key)
+        finally:
+            for file in files:
+                file.close()
+
+    def write_csv(self, path, append=False):
+        """ Write the merged rows to a CSV file, or append them (without a header) to it. """
+        with open(path, 'a' if append else 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            if not append:
+                writer.writerow(MATCH_FILE_COLUMNS)
+            writer.writerows(self.merged())
+
+    def close(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
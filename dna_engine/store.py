@@ -0,0 +1,380 @@
+""" Indexed SQLite store for the allele table and the matches, appended to on each run. """
+import contextlib
+import csv
+import os
+import pathlib
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from pandas.util import hash_pandas_object
+
+from dna_engine.categorical import compact_rows
+from dna_engine.manifest import MANIFEST_COLUMNS
+from dna_engine.matching import MATCH_COLUMNS
+
+DATA_COLUMNS = ['FileName', 'CaseID', 'SpecimenID', 'SpecimenComment', 'LocusName', 'ReadingBy', 'ReadingDateTime', 'AlleleValue']
+MATCH_FILE_COLUMNS = ['LocusName'] + MATCH_COLUMNS   # column layout of DNA_matches.csv
+STORED_COLUMNS = DATA_COLUMNS + ['SourceFile']   # columns of the alleles table: the rows and the file they came from
+ROW_KEY_COLUMNS = ['SpecimenID', 'LocusName', 'AlleleValue', 'ReadingDateTime']   # what makes a row a duplicate
+ROW_KEYS_TABLE = 'row_keys ("Key" INTEGER, "Source" TEXT, PRIMARY KEY ("Key", "Source")) WITHOUT ROWID'
+DUPLICATE_COLUMNS = DATA_COLUMNS + ['SourceFile', 'DuplicateOf']
+EXPORT_CHUNK_ROWS = 200000
+
+
+def quote(column):
+    return f'"{column}"'
+
+
+def normalise_times(values):
+    """ Match times as 'YYYY-MM-DD HH:MM:SS' text (None when unknown), so they sort chronologically. """
+    values = pd.Series(values, dtype=object)
+    try:
+        times = pd.to_datetime(values)
+    except (ValueError, TypeError):
+        times = values.map(lambda value: pd.to_datetime(value, errors='coerce'))   # mixed formats
+    return [None if pd.isna(time) else str(time) for time in times]
+
+
+def has_header(path, columns):
+    """ Whether the CSV file at path exists and its header is columns, so rows can be appended to it. """
+    try:
+        with open(path, newline='', encoding='utf-8') as file:
+            return next(csv.reader(file), None) == list(columns)
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def row_keys(df):
+    """ 64-bit hash of the ROW_KEY_COLUMNS of each row, as int64 since SQLite integers are signed.
+
+    Categorical and object columns with the same values hash the same, and so do None and NaN.
+    """
+    return hash_pandas_object(df.reindex(columns=ROW_KEY_COLUMNS), index=False).to_numpy().view(np.int64)
+
+
+def sql_values(df, columns):
+    """ Rows of df as tuples of Python values with NaN as None. """
+    frame = df.reindex(columns=columns).astype(object)
+    return list(frame.where(frame.notna(), None).itertuples(index=False, name=None))
+
+
+class DataStore:
+    """ Allele rows and matches in one SQLite file.
+
+    Rows are appended with the file they came from (SourceFile, the manifest key of the input file),
+    so the rows of a file that changed can be removed before its new rows are added. Reads can pick
+    columns and specimens, and the CSV files are written as exports of the store. Rows are keyed on
+    their specimen, locus, allele and reading time: a row repeated within a file is stored once, and
+    a file whose keys are all stored from one other file is skipped as a re-exported copy of it (see
+    append_rows). The row_keys table holds a hash of those fields (see row_keys) with the file of
+    the stored row, so new rows are checked by key lookups without touching the stored rows.
+
+    Each method commits its own changes, unless it runs inside a transaction() block: then all the
+    changes of the block are committed together at its end.
+
+    With read_only, an existing store is opened for reading only (FileNotFoundError if there is none).
+    """
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.created = not os.path.exists(path)
+        self.depth = 0   # nesting of transaction() blocks
+        if read_only:
+            if self.created:
+                raise FileNotFoundError(f"{path} does not exist")
+            self.connection = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+            return
+        self.connection = sqlite3.connect(path)
+        tables = {row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        columns = ', '.join(f'{quote(column)} TEXT' for column in STORED_COLUMNS)
+        match_columns = ', '.join(f'{quote(column)} {"REAL" if column == "MatchScore" else "TEXT"}'
+                                  for column in MATCH_FILE_COLUMNS)
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS alleles ({columns});
+            DROP INDEX IF EXISTS alleles_row;
+            CREATE TABLE IF NOT EXISTS {ROW_KEYS_TABLE};
+            CREATE INDEX IF NOT EXISTS alleles_specimen ON alleles ("SpecimenID");
+            CREATE TABLE IF NOT EXISTS matches ({match_columns});
+            CREATE INDEX IF NOT EXISTS matches_time ON matches ("LatestMatchTime");
+            CREATE INDEX IF NOT EXISTS matches_specimen1 ON matches ("SpecimenID1");
+            CREATE INDEX IF NOT EXISTS matches_specimen2 ON matches ("SpecimenID2");
+            CREATE TABLE IF NOT EXISTS manifest ("Path" TEXT PRIMARY KEY, "Size" INTEGER, "MTime" INTEGER,
+                                                 "Hash" TEXT, "DuplicateOf" TEXT);
+            CREATE TABLE IF NOT EXISTS folders ("Path" TEXT PRIMARY KEY, "MTime" INTEGER);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+            INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+        """)
+        if 'alleles' in tables and 'SourceFile' not in self.table_columns('alleles'):
+            self._add_source_files(from_row_keys='row_keys' in tables)
+        key_columns = {row[1]: row[5] for row in self.connection.execute("PRAGMA table_info(row_keys)")}
+        if 'alleles' in tables and ('row_keys' not in tables or not key_columns['Source']):
+            self._index_stored_rows()   # no row_keys yet, or keyed on the row alone
+
+    def table_columns(self, table):
+        return [row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")]
+
+    def _add_source_files(self, from_row_keys):
+        """ Add the SourceFile column to the rows of a store made by an older version.
+
+        Each stored row has its own key, so its file is the one row_keys holds for the key; stores
+        older than row_keys only have the FileName column to go by.
+        """
+        print(f"Recording the source file of the rows stored in {self.path}")
+        query = f"SELECT rowid, {', '.join(quote(column) for column in ROW_KEY_COLUMNS)} FROM alleles ORDER BY rowid"
+        with self.transaction():
+            self.connection.execute('ALTER TABLE alleles ADD COLUMN "SourceFile" TEXT')
+            if not from_row_keys:
+                self.connection.execute('UPDATE alleles SET "SourceFile" = "FileName"')
+                return
+            for chunk in pd.read_sql_query(query, self.connection, chunksize=EXPORT_CHUNK_ROWS):
+                self.connection.executemany('UPDATE alleles SET "SourceFile" = (SELECT "Source" FROM row_keys WHERE "Key" = ?) '
+                                            'WHERE rowid = ?', zip(row_keys(chunk).tolist(), chunk['rowid'].tolist()))
+
+    def _index_stored_rows(self):
+        """ Fill row_keys from the stored rows of a store made by an older version. """
+        print(f"Indexing the rows stored in {self.path}")
+        query = f"SELECT {', '.join(quote(column) for column in ROW_KEY_COLUMNS + ['SourceFile'])} FROM alleles ORDER BY rowid"
+        with self.transaction():
+            self.connection.execute("DROP TABLE row_keys")
+            self.connection.execute(f"CREATE TABLE {ROW_KEYS_TABLE}")
+            for chunk in pd.read_sql_query(query, self.connection, chunksize=EXPORT_CHUNK_ROWS):
+                self.connection.executemany("INSERT OR IGNORE INTO row_keys VALUES (?, ?)",
+                                            zip(row_keys(chunk).tolist(), chunk['SourceFile'].astype(object).tolist()))
+
+    def close(self):
+        self.connection.close()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Commit the changes made in the block when the outermost block ends; roll them back on an error. """
+        self.depth += 1
+        try:
+            yield
+        except BaseException:
+            self.depth -= 1
+            if not self.depth:
+                self.connection.rollback()
+            raise
+        self.depth -= 1
+        if not self.depth:
+            self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def generation(self):
+        """ Counter bumped by every change to the allele rows, used to tell if an index is current. """
+        return self.connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def row_count(self):
+        return self.connection.execute("SELECT count(*) FROM alleles").fetchone()[0]
+
+    def append_rows(self, df):
+        """ Append new allele rows, skipping duplicates; return (rows added, duplicate rows).
+
+        The rows of a file (df's SourceFile column, else FileName) are skipped as a re-exported copy
+        when every key among them is stored from one other file, or comes from an earlier file of df
+        that is not a copy itself. Otherwise all of them are stored, even if another file has some
+        of the same keys (a GeneMapper re-run, say, which has no reading times), except for rows
+        repeated within the file. The duplicate rows come back with SourceFile, the file they came
+        from, and DuplicateOf, the file they are a copy of (their own file for rows repeated in it).
+        """
+        keys = row_keys(df)
+        sources = (df['SourceFile'] if 'SourceFile' in df.columns else df.reindex(columns=['FileName'])['FileName'])
+        sources = sources.to_numpy(dtype=object)
+        incoming = pd.DataFrame({'Key': keys, 'Source': sources})
+        stored = pd.DataFrame(self.key_sources(pd.unique(keys)), columns=['Key', 'Source'])
+        # Rows repeated within their file, including a file read again while its rows are stored
+        repeated = pd.concat([stored, incoming], ignore_index=True).duplicated().to_numpy()[len(stored):]
+        copies = self._copied_files(incoming[~repeated], stored)
+        of_copy = incoming['Source'].isin(list(copies)).to_numpy()
+        new = ~repeated & ~of_copy
+
+        added = df[new].reindex(columns=DATA_COLUMNS)
+        with self.transaction():
+            placeholders = ', '.join('?' * len(STORED_COLUMNS))
+            self.connection.executemany(f"INSERT INTO alleles VALUES ({placeholders})",
+                                        sql_values(added.assign(SourceFile=sources[new]), STORED_COLUMNS))
+            # In key order, so the primary key B-tree is filled sequentially
+            order = np.argsort(keys[new], kind='stable')
+            self.connection.executemany("INSERT INTO row_keys VALUES (?, ?)",
+                                        zip(keys[new][order].tolist(), sources[new][order].tolist()))
+            self.connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+        duplicates = df[~new].reindex(columns=DATA_COLUMNS).astype(object)
+        duplicates['SourceFile'] = sources[~new]
+        duplicates['DuplicateOf'] = [copies.get(source, source) for source in sources[~new].tolist()]
+        return compact_rows(added.reset_index(drop=True)), duplicates.reset_index(drop=True)
+
+    @staticmethod
+    def _copied_files(incoming, stored):
+        """ {file: the file it is a copy of} for the files of incoming whose keys another file holds.
+
+        incoming and stored are (Key, Source) frames with each key once per file. A file is a copy
+        of a stored file holding all its keys, or of an earlier incoming file holding them that is
+        not a copy itself; a stored file is preferred, then the earliest incoming one.
+        """
+        files = pd.unique(incoming['Source'])
+        rank = {file: k for k, file in enumerate(files.tolist())}
+        holders = pd.concat([stored.assign(Rank=-1), incoming.assign(Rank=incoming['Source'].map(rank))], ignore_index=True)
+        # Only files whose keys are all held by another file as well can be copies
+        shared = holders['Key'].duplicated(keep=False).to_numpy()[len(stored):]
+        unshared = set(incoming['Source'][~shared].tolist())
+        incoming = incoming[~incoming['Source'].isin(list(unshared))]
+        pairs = incoming.merge(holders, on='Key', suffixes=('', 'Holder'))
+        pairs = pairs[pairs['Source'] != pairs['SourceHolder']]
+        held = pairs.groupby(['Source', 'Rank', 'SourceHolder'], sort=True).size()
+        sizes = incoming['Source'].value_counts()
+        held = held[held.to_numpy() == sizes.reindex(held.index.get_level_values('Source')).to_numpy()]
+        candidates = {}
+        for file, holder_rank, holder in held.index:
+            candidates.setdefault(file, []).append((holder_rank, holder))
+        copies = {}
+        for file in files.tolist():
+            for holder_rank, holder in candidates.get(file, ()):
+                if holder_rank < 0 or (holder_rank < rank[file] and holder not in copies):
+                    copies[file] = holder
+                    break
+        return copies
+
+    def delete_rows(self, sources):
+        """ Remove the rows stored from the given files (SourceFile values) with their row keys.
+
+        Returns the SpecimenIDs of the removed rows. Files are rarely replaced, so the rows are found
+        by a scan rather than through an index every append would have to keep up.
+        """
+        if not len(sources):
+            return []
+        with self.transaction():
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS replaced (path TEXT PRIMARY KEY)")
+            self.connection.execute("DELETE FROM replaced")
+            self.connection.executemany("INSERT OR IGNORE INTO replaced VALUES (?)", [(str(source),) for source in sources])
+            rows = self.connection.execute('SELECT DISTINCT "SpecimenID" FROM alleles WHERE "SourceFile" IN (SELECT path FROM replaced)')
+            specimen_ids = [row[0] for row in rows]
+            if specimen_ids:
+                self.connection.execute('DELETE FROM alleles WHERE "SourceFile" IN (SELECT path FROM replaced)')
+                self.connection.execute('DELETE FROM row_keys WHERE "Source" IN (SELECT path FROM replaced)')
+                self.connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        return specimen_ids
+
+    def key_sources(self, keys):
+        """ (key, source file) pairs of the given row keys that are already stored. """
+        if self.connection.execute("SELECT 1 FROM row_keys LIMIT 1").fetchone() is None:
+            return []
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS incoming_keys ("Key" INTEGER PRIMARY KEY)')
+        self.connection.execute("DELETE FROM incoming_keys")
+        self.connection.executemany("INSERT OR IGNORE INTO incoming_keys VALUES (?)", ((key,) for key in np.sort(keys).tolist()))
+        rows = self.connection.execute('SELECT row_keys."Key", "Source" FROM incoming_keys JOIN row_keys USING ("Key")')
+        return rows.fetchall()
+
+    def read_rows(self, columns=None, specimen_ids=None, where=None, params=()):
+        """ Allele rows in the order they were added, optionally only some columns or specimens.
+
+        Text columns come back dictionary-encoded (see dna_engine.categorical).
+        """
+        columns = columns or DATA_COLUMNS
+        query = f"SELECT {', '.join(quote(column) for column in columns)} FROM alleles"
+        conditions, params = ([where] if where else []), list(params)
+        if specimen_ids is not None:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (id TEXT PRIMARY KEY)")
+            self.connection.execute("DELETE FROM wanted")
+            self.connection.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", [(str(i),) for i in specimen_ids])
+            conditions.append('"SpecimenID" IN (SELECT id FROM wanted)')
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        return compact_rows(pd.read_sql_query(query + ' ORDER BY rowid', self.connection, params=params))
+
+    def latest_match_time(self):
+        """ Latest stored LatestMatchTime (None if there are no matches with a time). """
+        return self.connection.execute("SELECT max(\"LatestMatchTime\") FROM matches").fetchone()[0]
+
+    def unknown_match_times(self):
+        """ Whether a stored match has no LatestMatchTime. """
+        return self.connection.execute('SELECT 1 FROM matches WHERE "LatestMatchTime" IS NULL LIMIT 1').fetchone() is not None
+
+    def append_matches(self, matches):
+        """ Store new match rows; returns True if they can be appended to the CSV export.
+
+        That is when none is earlier than the stored ones and no time, new or stored, is unknown:
+        unknown times sort first (as ORDER BY does), so rows with one can only go in by a new export.
+        """
+        rows = matches.reindex(columns=MATCH_FILE_COLUMNS)
+        times = normalise_times(rows['LatestMatchTime'])   # compared as a list: in the column None turns into NaN
+        rows['LatestMatchTime'] = times
+        latest = self.latest_match_time()
+        in_order = (None not in times and not self.unknown_match_times()
+                    and (latest is None or all(time >= latest for time in times)))
+        with self.transaction():
+            placeholders = ', '.join('?' * len(MATCH_FILE_COLUMNS))
+            self.connection.executemany(f"INSERT INTO matches VALUES ({placeholders})", sql_values(rows, MATCH_FILE_COLUMNS))
+        return in_order
+
+    def delete_matches(self, specimen_ids):
+        """ Remove stored matches involving any of specimen_ids; returns how many were removed. """
+        ids = [(str(i), str(i)) for i in specimen_ids]
+        with self.transaction():
+            before = self.connection.total_changes
+            self.connection.executemany('DELETE FROM matches WHERE "SpecimenID1" = ? OR "SpecimenID2" = ?', ids)
+            return self.connection.total_changes - before
+
+    def matched_ids(self):
+        """ Set of SpecimenIDs that appear in a stored match. """
+        rows = self.connection.execute('SELECT "SpecimenID1" FROM matches UNION SELECT "SpecimenID2" FROM matches')
+        return {row[0] for row in rows}
+
+    def read_manifest(self):
+        """ Scan manifest entries as tuples in MANIFEST_COLUMNS order. """
+        return self.connection.execute(f"SELECT {', '.join(quote(column) for column in MANIFEST_COLUMNS)} FROM manifest").fetchall()
+
+    def write_manifest(self, entries):
+        """ Insert or replace scan manifest entries. """
+        with self.transaction():
+            self.connection.executemany("INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?)", entries)
+
+    def read_folders(self):
+        """ Folder modification times of the last complete scan, as a {folder key: mtime} dict. """
+        return dict(self.connection.execute('SELECT "Path", "MTime" FROM folders').fetchall())
+
+    def write_folders(self, folders):
+        """ Replace the stored folder modification times. """
+        with self.transaction():
+            self.connection.execute("DELETE FROM folders")
+            self.connection.executemany("INSERT INTO folders VALUES (?, ?)", folders.items())
+
+    def export_rows_csv(self, path, rows=None):
+        """ Write the allele rows to CSV; with rows, append just those to an existing export.
+
+        A file with another header (e.g. from an older version) is exported again in full.
+        """
+        if rows is not None and has_header(path, DATA_COLUMNS):
+            rows.reindex(columns=DATA_COLUMNS).to_csv(path, mode='a', header=False, index=False)
+            return
+        self._export(f"SELECT {', '.join(quote(column) for column in DATA_COLUMNS)} FROM alleles ORDER BY rowid", path)
+
+    def export_matches_csv(self, path, matches=None):
+        """ Write the matches to CSV sorted by LatestMatchTime; with matches, append just those.
+
+        A file with another header (e.g. the five columns of older versions) is exported again in full.
+        """
+        if matches is not None and has_header(path, MATCH_FILE_COLUMNS):
+            rows = matches.reindex(columns=MATCH_FILE_COLUMNS)
+            rows['LatestMatchTime'] = normalise_times(rows['LatestMatchTime'])
+            rows = rows.sort_values('LatestMatchTime', kind='stable', na_position='first')   # as ORDER BY sorts NULL
+            rows.to_csv(path, mode='a', header=False, index=False)
+            return
+        self._export('SELECT * FROM matches ORDER BY "LatestMatchTime", rowid', path)
+
+    def _export(self, query, path):
+        header = True
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            for chunk in pd.read_sql_query(query, self.connection, chunksize=EXPORT_CHUNK_ROWS):
+                chunk.to_csv(file, header=header, index=False)
+                header = False
+            if header:   # empty table
+                cursor = self.connection.execute(query + ' LIMIT 0')
+                pd.DataFrame(columns=[column[0] for column in cursor.description]).to_csv(file, index=False)
@@ -0,0 +1,95 @@
+""" Wide per-specimen summary (final_DNA_sequencing_summary.csv) built from the long allele table. """
+import os
+
+import numpy as np
+import pandas as pd
+
+from dna_engine.categorical import map_categories, sorted_codes
+
+SUMMARY_INDEX = ['FileName', 'CaseID', 'SpecimenID', 'SpecimenComment', 'ReadingBy', 'ReadingDateTime']
+LOCUS_NAME_MAP = {
+    'Amelogenin': 'AMEL',  # Mapping 'Amelogenin' to 'AMEL'
+    # Add additional mappings if necessary
+}
+
+
+def clean_locus_names(df):
+    """ Strip LocusName values and apply LOCUS_NAME_MAP, in place. """
+    if isinstance(df['LocusName'].dtype, pd.CategoricalDtype):
+        # Only the distinct names are cleaned
+        df['LocusName'] = map_categories(df['LocusName'], lambda names: names.str.strip().replace(LOCUS_NAME_MAP))
+        return df
+    df['LocusName'] = df['LocusName'].str.strip()
+    df['LocusName'] = df['LocusName'].replace(LOCUS_NAME_MAP)
+    return df
+
+
+def order_rows(summary):
+    """ Sort summary rows by the index columns, then by ReadingDateTime as unmelting_data does. """
+    summary = summary.sort_values(SUMMARY_INDEX, kind='stable', ignore_index=True)
+    return summary.sort_values('ReadingDateTime', ascending=True)
+
+
+def pivot_alleles(df):
+    """ One row per SUMMARY_INDEX group with <locus>_1/<locus>_2 columns holding its two lowest alleles.
+
+    Alleles are ranked within each (row, locus) by (missing, value), the same None-last order as
+    sorting the allele lists, and the first two ranks are unstacked into the locus columns. Loci
+    a row was not typed on hold None. Rows with a missing index field or LocusName are dropped, as
+    pivot_table drops them. The result is in index order; use order_rows for the file order.
+    """
+    data = df.dropna(subset=SUMMARY_INDEX + ['LocusName'])
+    columns = SUMMARY_INDEX.copy()
+    if data.empty:
+        return pd.DataFrame(columns=columns)
+
+    groups = data.groupby(SUMMARY_INDEX, sort=True)
+    row_codes = groups.ngroup().to_numpy()
+    locus_codes, loci = sorted_codes(data['LocusName'])
+    value_codes, values = sorted_codes(data['AlleleValue'])
+    value_codes = np.where(value_codes < 0, len(values), value_codes)   # NaN after every value
+
+    order = np.lexsort((value_codes, locus_codes, row_codes))
+    cell = row_codes[order].astype(np.int64) * len(loci) + locus_codes[order]
+    starts = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+    rank = np.arange(len(cell)) - np.repeat(starts, np.diff(np.r_[starts, len(cell)]))
+    first_two = rank < 2
+
+    n_rows = row_codes.max() + 1
+    alleles = np.full((n_rows, len(loci), 2), None, dtype=object)
+    picked = order[first_two]
+    allele_values = data['AlleleValue'].to_numpy(dtype=object)[picked]
+    alleles[row_codes[picked], locus_codes[picked], rank[first_two]] = allele_values
+    alleles[pd.isna(alleles)] = None
+
+    index = groups.size().index.to_frame(index=False)
+    locus_columns = [f"{locus}_{slot}" for locus in loci for slot in (1, 2)]
+    wide = pd.DataFrame(alleles.reshape(n_rows, -1), columns=locus_columns, dtype=object)
+    summary = pd.concat([index.astype(object), wide], axis=1)
+    summary.columns.name = 'LocusName'   # as left by pivot_table
+    return summary
+
+
+def update_summary(summary_path, rows, specimen_ids, summary=None):
+    """ Re-pivot the rows of specimen_ids and merge them into the summary CSV at summary_path.
+
+    rows must hold every stored allele row of those specimens. Summary rows of other specimens are
+    kept as they are, so the file ends up the same as a full rebuild. summary is the summary as
+    last written, to skip reading the file back. Returns the updated summary.
+    """
+    fresh = pivot_alleles(clean_locus_names(rows))
+    if summary is not None:
+        summary = summary[~summary['SpecimenID'].isin([str(i) for i in specimen_ids])]
+    elif os.path.exists(summary_path) and os.path.getsize(summary_path):
+        summary = pd.read_csv(summary_path, dtype=str).astype(object)
+        summary = summary[~summary['SpecimenID'].isin([str(i) for i in specimen_ids])]
+    else:
+        summary = pd.DataFrame(columns=SUMMARY_INDEX)
+
+    loci = sorted({column.rsplit('_', 1)[0] for frame in (summary, fresh) for column in frame.columns
+                   if column not in SUMMARY_INDEX})
+    columns = SUMMARY_INDEX + [f"{locus}_{slot}" for locus in loci for slot in (1, 2)]
+    merged = pd.concat([summary.reindex(columns=columns), fresh.reindex(columns=columns)], ignore_index=True)
+    merged = order_rows(merged.astype(object).where(merged.notna(), None))
+    merged.to_csv(summary_path, index=False)
+    return merged